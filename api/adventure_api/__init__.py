@@ -1,7 +1,5 @@
 import asyncio
-import threading
 import logging
-import shlex
 import time
 from uuid import uuid4
 import jwt
@@ -13,13 +11,14 @@ from pydantic import BaseModel
 from typing import Optional
 from config import get_conn
 from game import Character, World
+from game.character import connect_character, disconnect_character
+from game.game_loop import load_world, run_game_loop
+from game.shard import WORLD_SHARDS, ShardRouter
 from model import check_password, get_auth_user, register_user
 from setup import setup_database
 from starlette.middleware.authentication import AuthenticationMiddleware
 from auth import BearerTokenBackend
 from api import user_router
-from game.data import load_data
-from game.sentence import SentenceHandler, SentenceParseError
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -126,71 +125,20 @@ async def play(ws: WebSocket, session: str):
         await ws.close()
         return
     logging.info('user [%s] connected', user.get('id'))
-    for loaded_character in World._characters:
-        if loaded_character._id == user.get('id'):
-            if loaded_character._session_id != session:
-                await loaded_character._ws.send_json(dict(type='error', data='You have logged in elsewhere, please refresh to reconnect here.', retry=False))
-            await loaded_character._ws.close()
-            break
+    if router:
+        await router.play(ws, user.get('id'), session)
+        return
+    loaded_character = World.get_player_by_id(user.get('id'))
+    if loaded_character:
+        if loaded_character._session_id != session:
+            await loaded_character._ws.send_json(dict(type='error', data='You have logged in elsewhere, please refresh to reconnect here.', retry=False))
+        await loaded_character._ws.close()
     character: Optional[Character] = None
     try:
-        character = World.get_player_by_id(user.get('id'), True)
-        if not character:
-            character = Character(user.get('id'), ws, session)
-            if character.name:
-                await World.send_to_all('chat', '@lgr@{}@res@ has just logged in.\n', character.name)
-            World.add_player(character)
-            await character.handle_login()
-        else:
-            continue_session = character._session_id == session
-            character._ws = ws
-            character._session_id = session
-            character._disconnected = False
-            World.add_player(character)
-            if continue_session:
-                await character.handle_login(send_motd=False)
-            else:
-                await character.handle_login()
-
+        character = await connect_character(user.get('id'), ws, session)
         while True:
             data = await ws.receive_json()
-            try:
-                command = shlex.split(data['data'])
-            except ValueError:
-                command = data['data'].split(" ")
-            except KeyError:
-                command = ['']
-            if len(data['data']) > 0 and data['data'].split(' ')[-1] == '':
-                command.append('')
-            if data['type'] == 'autocomplete_suggest':
-                suggestion = character.command_handler.get_suggestion(
-                    command)
-                await ws.send_json(dict(type='suggestion', data=suggestion))
-            elif data['type'] == 'autocomplete_get':
-                suggestion = character.command_handler.get_suggestion(
-                    command,
-                    True)
-                await ws.send_json(dict(type='autocomplete', data=suggestion))
-            elif data['type'] == 'game':
-                if character._settings.get('input', 'command') == 'command':
-                    logger.info(
-                        'handling command [%s] for [%s]',
-                        data['data'],
-                        character._name)
-                    await character.command_handler.handle_input(command)
-                elif character._settings.get('input', 'command') == 'sentence':
-                    logger.info(
-                        'handling sentence [%s] for [%s]',
-                        data['data'],
-                        character._name)
-                    try:
-                        await SentenceHandler.parse_sentence(character, data['data'])
-                    except SentenceParseError as e:
-                        await ws.send_json(dict(type='game', data=str(e)))
-                else:
-                    logging.error('unknown input type [%s]', character._settings.get('input', 'command'))
-            elif data['type'] == 'ping':
-                await ws.send_json(dict(type='pong', data=''))
+            await character.handle_client_input(data)
     except WebSocketDisconnect:
         logging.info('websocket [%s] disconnected', user['id'])
     except Exception as e:
@@ -199,52 +147,43 @@ async def play(ws: WebSocket, session: str):
         await ws.close()
     finally:
         if character:
-            character._disconnected = True
-            World.remove_player(character)
+            disconnect_character(character, ws)
 
 is_running = True
 
 
 async def loop():
-    logger.info('starting game loop')
-    while is_running:
-        try:
-            now = time.perf_counter()
-            await World.tick()
-
-            now = time.perf_counter() - now
-            if now > 600:
-                now = 600
-            await asyncio.sleep((600 - now) / 1000)
-        except Exception as e:
-            logger.error(f'error occurred in game loop')
-            logger.exception(e)
-    logger.info('saving awaiting characters loop')
-    for c in World._characters:
-        c.save_character()
-    for c in World._awaiting_characters:
-        c[0].save_character()
-    logger.info('ending game loop')
-
-thread = threading.Thread(target=lambda: asyncio.run(loop()))
+    await run_game_loop(lambda: is_running)
 
+game_task: Optional[asyncio.Task] = None
+router: Optional[ShardRouter] = None
 
-@app.on_event("startup")
-def begin_game_loop():
-    load_data()
-    SentenceHandler.load_terms()
 
+@app.on_event("startup")
+async def begin_game_loop():
     app.include_router(user_router)
     app.add_middleware(AuthenticationMiddleware, backend=BearerTokenBackend())
 
     global is_running
     is_running = True
     setup_database()
-    thread.start()
+    global router
+    if WORLD_SHARDS > 1:
+        router = ShardRouter(WORLD_SHARDS)
+        router.start()
+        return
+    load_world()
+    # The game loop runs on the server's event loop so ticks never race with
+    # the websocket handlers over the world state.
+    global game_task
+    game_task = asyncio.create_task(loop())
 
 
 @app.on_event("shutdown")
-def end_game_loop():
+async def end_game_loop():
     global is_running
     is_running = False
-    thread.join()
+    if router:
+        await router.stop()
+    if game_task:
+        await game_task
@@ -1,5 +1,6 @@
 from argparse import ArgumentParser
 from setup import get_conn, setup_database
+from game.terrain import bake_terrain
 
 parser = ArgumentParser(
     description='A command-line utility tool for managing the adventure game.')
@@ -23,6 +24,39 @@ user_parser.add_argument(
     help='The email of what you want to action.')
 user_parser.set_defaults(handler='users')
 
+terrain_parser = subparsers.add_parser(
+    'terrain', help='Handles the baked world terrain.')
+terrain_parser.add_argument(
+    'action', choices=['bake'],
+    help='The action to do on the terrain.')
+terrain_parser.add_argument(
+    '-o',
+    '--output',
+    type=str,
+    default='./data/terrain.bin',
+    help='The file to bake the terrain to.')
+terrain_parser.add_argument(
+    '-x',
+    type=int,
+    default=-1024,
+    help='The x coordinate of the top left of the baked region.')
+terrain_parser.add_argument(
+    '-z',
+    type=int,
+    default=-1024,
+    help='The z coordinate of the top left of the baked region.')
+terrain_parser.add_argument(
+    '--width',
+    type=int,
+    default=2048,
+    help='The number of tiles to bake along the x axis.')
+terrain_parser.add_argument(
+    '--depth',
+    type=int,
+    default=2048,
+    help='The number of tiles to bake along the z axis.')
+terrain_parser.set_defaults(handler='terrain')
+
 if __name__ == '__main__':
     args = parser.parse_args()
     driver, conn = get_conn()
@@ -80,3 +114,8 @@ if __name__ == '__main__':
             finally:
                 conn.close()
             print(f'Reset {args.email}')
+    elif args.handler == 'terrain':
+        if args.action == 'bake':
+            bake_terrain(args.output, args.x, args.z, args.width, args.depth)
+            print(
+                f'Baked {args.width}x{args.depth} tiles from {args.x}, {args.z} to {args.output}')
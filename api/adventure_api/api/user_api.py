@@ -10,6 +10,7 @@ from fastapi.responses import JSONResponse, PlainTextResponse
 from pydantic import BaseModel
 from model import get_users, get_user_by_id, get_guest_user
 from game import World
+from game.tick_metrics import TICK_METRICS
 from setup import get_conn
 
 user_router = APIRouter()
@@ -35,9 +36,10 @@ async def get_users_route(request: Request):
     user = request.user
     if not user or not user['is_admin']:
         raise HTTPException(403, 'You do not have permission to access this resource.')
-    users = [
-        dict(id=u[0], email=u[1], name=u[2], location='Offline' if World.get_player(u[2]) is None else World.get_player(u[2]).coordinate_str, is_admin=u[3]) for u in get_users()
-    ]
+    users = []
+    for u in get_users():
+        player = World.get_player_by_id(u[0])
+        users.append(dict(id=u[0], email=u[1], name=u[2], location='Offline' if player is None else player.coordinate_str, is_admin=u[3]))
 
     return {
         'data': users,
@@ -87,6 +89,21 @@ async def put_user_route(user_id: str, put_req: PutUserRequest, request: Request
 
     return user
 
+@user_router.get('/api/v1/metrics/tick')
+async def get_tick_metrics_route(request: Request):
+    """GET /api/v1/metrics/tick
+
+    Get the timings of the game loop.
+    """
+    user = request.user
+    if not user or not user['is_admin']:
+        raise HTTPException(403, 'You do not have permission to access this resource.')
+    return {
+        **TICK_METRICS.summary(),
+        'hibernating_cells': World._hibernating_cells.stats,
+        'loaded_cells': len(World._loaded_cells)
+    }
+
 @user_router.get('/api/v1/chatlog')
 async def get_chatlog_route(request: Request):
     """GET /api/v1/chatlog
@@ -1,8 +1,11 @@
 import os
 import psycopg2
 import sqlite3
+import threading
 from typing import Any
 
+_thread_conns = threading.local()
+
 
 def get_db_driver() -> str:
     return os.environ.get('DB_DRIVER', 'sqlite')
@@ -22,18 +25,49 @@ def get_conn() -> Any:
                 return get_conn()
 
         return conn
+    conn = _connect(db_driver)
+    if db_driver == 'postgres':
+        setattr(get_conn, 'connection', conn)
+    return conn
+
+
+def get_thread_conn() -> Any:
+    """Returns a connection owned by the calling thread, for background
+    threads which must not share the transaction of the main connection. A
+    sqlite connection is new for each call and should be closed, a postgres
+    connection is kept for the thread, call reset_thread_conn if it breaks."""
+    db_driver = get_db_driver()
+    if db_driver == 'sqlite':
+        return _connect(db_driver)
+    conn = getattr(_thread_conns, 'connection', None)
+    if conn is None or conn[1].closed:
+        conn = _connect(db_driver)
+        _thread_conns.connection = conn
+    return conn
+
+
+def reset_thread_conn():
+    """Closes and forgets the connection owned by the calling thread."""
+    conn = getattr(_thread_conns, 'connection', None)
+    _thread_conns.connection = None
+    if conn is not None:
+        try:
+            conn[1].close()
+        except psycopg2.Error:
+            pass
+
+
+def _connect(db_driver: str) -> Any:
     if db_driver == 'sqlite':
         return ('sqlite', sqlite3.connect(
             os.environ.get('DB_FILE', ':memory:')))
     elif db_driver == 'postgres':
-        conn = ('postgres', psycopg2.connect(
+        return ('postgres', psycopg2.connect(
             host=os.environ.get('DB_HOST', 'localhost'),
             database=os.environ.get('DB_DATABASE', 'pg'),
             user=os.environ.get('DB_USER', 'postgres'),
             password=os.environ.get('DB_PASSWORD'),
             port=os.environ.get('DB_PORT', 5432),
             sslmode=os.environ.get('DB_SSLMODE', None)))
-        setattr(get_conn, 'connection', conn)
-        return conn
     else:
         raise ValueError(f'unsupported database driver {db_driver}')
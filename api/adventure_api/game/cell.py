@@ -1,23 +1,84 @@
 import asyncio
 import json
+import math
 import random
-from .enemy import Enemy
+from .enemy import ENEMY_DATA, Enemy
+from .interest import INTEREST_GRID
 from .item import Item
-from noise import snoise2
+from .sampling import AliasSampler
+from .terrain import get_biome, get_biome_icon, get_population_icon
+from .timer_wheel import TIMER_WHEEL, Timer
 from typing import Any, Callable, Dict, Optional, List, NamedTuple, Tuple, Union, TYPE_CHECKING
 
 
 if TYPE_CHECKING:
     from .character import Character
 
-HEIGHT_SCALE = 60
-TREE_SCALE = 30
-
 with open('./data/biomes.json', 'r') as f:
     BIOME_DATA: Dict[str, Any] = json.loads(f.read())
 
 MAX_ENEMIES = 4
 SPAWN_TICK = 60
+SPAWN_CHANCE = 0.3
+
+
+class ScavengeEntry(NamedTuple):
+    """An item which can be scavenged within a biome, qualifiers given as
+    'script:<name>' are resolved to the Item function when the biome is
+    loaded and called for each find."""
+    item_id: str
+    qualifiers: Dict[str, str]
+    scripts: Dict[str, Callable[..., str]]
+
+    def roll(self, character: 'Character') -> List[Any]:
+        """Creates the item for a character which has found it.
+
+        :param character: The character which found the item."""
+        qualifiers = dict(self.qualifiers)
+        for k, fn in self.scripts.items():
+            qualifiers[k] = fn(character=character)
+        return [self.item_id, qualifiers]
+
+
+class BiomeTable(NamedTuple):
+    """The compiled spawn and scavenge tables of a biome."""
+    enemies: Optional[AliasSampler[str]]
+    scavenge: Optional[AliasSampler[ScavengeEntry]]
+
+
+BIOME_TABLES: Dict[str, BiomeTable] = {}
+
+
+def load_biomes():
+    """Validates the biome data and compiles the spawn and scavenge tables of
+    every biome, must be called after the enemies and items are loaded."""
+    BIOME_TABLES.clear()
+    for biome, data in BIOME_DATA.items():
+        enemies = None
+        if data.get('enemies'):
+            for internal_name, _ in data['enemies']:
+                if internal_name not in ENEMY_DATA:
+                    raise ValueError(f'biome [{biome}] spawns unknown enemy [{internal_name}]')
+            enemies = AliasSampler(data['enemies'])
+        scavenge = None
+        if data.get('scavenge'):
+            entries = []
+            for item in data['scavenge']:
+                item_id, qualifiers = item[0], item[1]
+                if item_id not in Item._item_data:
+                    raise ValueError(f'biome [{biome}] scavenges unknown item [{item_id}]')
+                scripts = {}
+                for k, v in qualifiers.items():
+                    if v.startswith('script:'):
+                        fn = getattr(Item, v[7:], None)
+                        if fn is None:
+                            raise ValueError(f'biome [{biome}] uses unknown script [{v[7:]}]')
+                        scripts[k] = fn
+                static = {k: v for k, v in qualifiers.items() if k not in scripts}
+                weight = item[2] if len(item) > 2 else 1
+                entries.append((ScavengeEntry(item_id, static, scripts), weight))
+            scavenge = AliasSampler(entries)
+        BIOME_TABLES[biome] = BiomeTable(enemies, scavenge)
 
 
 class Cell:
@@ -30,157 +91,305 @@ class Cell:
     _claimed_by: Optional[str]
     _characters: List['Character']
     _enemies: List[Enemy]
+    _entities: Dict[str, Union[Enemy, 'Character']]
+    _by_name: Dict[str, List[Enemy]]
+    _by_collective: Dict[str, List[Enemy]]
     _items: List[Tuple[str, Dict[str, str]]]
+    _item_views: Optional[List[Dict[str, Any]]]
     _spawn_tick: int
+    _spawn_timer: Optional[Timer]
+    _simulated_tick: Optional[int]
 
-    def __init__(self, x: int, z: int):
+    def __init__(self, x: int, z: int, data: Optional[str] = None):
+        """Constructs the Cell
+
+        :param x: The x coordinate of the cell.
+        :param z: The z coordinate of the cell.
+        :param data: The saved state of the cell if it has been saved."""
         self._x = x
         self._z = z
         self._characters = []
         self._enemies = []
-        self._items = [
-            ['dead_rabbit', {}],
-        ]
+        self._entities = {}
+        self._by_name = {}
+        self._by_collective = {}
+        self._items = []
+        self._item_views = None
         self._claimed_by = None
         self._spawn_tick = SPAWN_TICK
-        self.load()
-        for _ in range(MAX_ENEMIES):
-            self.spawn_random_enemy()
-            if random.random() > 0.5:
-                break
+        self._spawn_timer = None
+        self._simulated_tick = None
+        self.load(data)
 
     async def tick(self):
-        if self._spawn_tick > 0:
-            self._spawn_tick = self._spawn_tick - 1
-        for c in self._characters:
-            await c.tick()
+        """Called when the spawn timer is due, spawns an enemy if there is room
+        for one. A full cell waits for an enemy to be removed instead."""
+        self._spawn_timer = None
+        self._spawn_tick = 0
+        if len(self._enemies) >= MAX_ENEMIES:
+            return
+        e = self.spawn_random_enemy() if random.random() < SPAWN_CHANCE else None
+        if e is not None:
+            if isinstance(e.data['on_entry'], Callable):
+                await e.data['on_entry'](e, self)
+            else:
+                await self.send_message(
+                    'game', '@red@{}@res@ is wandering nearby.', e.name)
+        self.schedule_spawn(SPAWN_TICK)
+
+    def schedule_spawn(self, delay: int):
+        """Schedules the spawn timer of the cell.
+
+        :param delay: The number of ticks until the spawn timer is due."""
+        if self._spawn_timer is not None:
+            self._spawn_timer.cancel()
+        self._spawn_tick = delay
+        self._spawn_timer = TIMER_WHEEL.schedule(delay, self.tick)
+
+    def wake(self):
+        """Called when the cell is loaded, catches up on the ticks it was not
+        simulated for then schedules the spawn timer and any enemies which are
+        fighting."""
+        if self._simulated_tick is not None:
+            self.catch_up(TIMER_WHEEL.world_tick - self._simulated_tick)
+            self._simulated_tick = None
+        self.schedule_spawn(self._spawn_tick)
         for e in self._enemies:
-            await e.tick()
-        if len(self._enemies) < MAX_ENEMIES and self._spawn_tick == 0:
-            if random.random() > 0.7:
-                e = self.spawn_random_enemy()
-                if isinstance(e.data['on_entry'], Callable):
-                    await e.data['on_entry'](e, self)
-                else:
-                    await self.send_message(
-                        'game', '@red@{}@res@ is wandering nearby.', e.name)
-            self._spawn_tick = SPAWN_TICK
+            e.schedule()
     
-    def spawn_random_enemy(self) -> Enemy:
-        if 'enemies' in self.data:
-            max_chance = sum([e[1] for e in self.data['enemies']])
-            rand = random.random() * max_chance
+    def catch_up(self, ticks: int):
+        """Fast-forwards the spawn timer over ticks the cell was not simulated
+        for. Rather than rolling every spawn attempt, the number of attempts
+        until each spawn succeeds is drawn from the geometric distribution, so
+        the cost depends on the room in the cell not the time it was away.
+
+        :param ticks: The number of ticks to fast-forward."""
+        if ticks < self._spawn_tick:
+            self._spawn_tick -= max(ticks, 0)
+            return
+        ticks -= self._spawn_tick
+        attempts = ticks // SPAWN_TICK + 1
+        self._spawn_tick = SPAWN_TICK - ticks % SPAWN_TICK
+        while len(self._enemies) < MAX_ENEMIES:
+            attempts -= int(
+                math.log(1.0 - random.random()) / math.log(1 - SPAWN_CHANCE)) + 1
+            if attempts < 0:
+                break
+            if self.spawn_random_enemy() is None:
+                break
+
+    def spawn_random_enemy(self) -> Optional[Enemy]:
+        """Spawns an enemy picked by the spawn weights of the biome, if the
+        biome has any enemies."""
+        table = BIOME_TABLES.get(self._biome)
+        if table is None or table.enemies is None:
+            return None
+        return self.spawn(table.enemies.sample())
 
-            for enemy in self.data['enemies']:
-                rand -= enemy[1]
-                if rand <= 0:
-                    return self.spawn(enemy[0])
+    async def send_message(self, type: str, message: str, *args, radius: int = 0, **kwargs):
+        """Sends a message to the characters within the cell, or within every
+        occupied cell in the area of interest around it.
 
-    async def send_message(self, type: str, message: str, *args, **kwargs):
+        :param type: The message type.
+        :param message: The message to send.
+        :param radius: The Chebyshev radius of cells which receive the
+            message, 0 for only this cell.
+        :param *args: The arguments for formatting.
+        :param **kwargs: The arguments for formatting."""
+        cells = INTEREST_GRID.near(self._x, self._z, radius) if radius > 0 else [self]
+        if self not in cells:
+            cells.append(self)
         await asyncio.gather(*[
             c.send_message(type, message, *args, **kwargs)
-            for c in self._characters
+            for cell in cells
+            for c in cell._characters
         ])
 
-    def load(self):
+    def load(self, data: Optional[str] = None):
+        """Loads the cell, restoring the saved state if there is any or
+        populating it for the first time otherwise.
+
+        :param data: The saved state of the cell."""
         self.generate()
+        self._item_views = None
+        if data:
+            self.from_json(data)
+            return
+        self._items = [
+            ['dead_rabbit', {}],
+        ]
+        for _ in range(MAX_ENEMIES):
+            self.spawn_random_enemy()
+            if random.random() > 0.5:
+                break
+
+    def to_json(self) -> str:
+        """Converts the cell to JSON for saving."""
+        return json.dumps(dict(
+            items=self._items,
+            enemies=[[e._internal_name, e._current_hp] for e in self._enemies],
+            claimed_by=self._claimed_by,
+            spawn_tick=self.spawn_tick,
+            simulated_tick=self.simulated_tick))
+
+    def from_json(self, raw_data: str):
+        """Converts the cell back from JSON for loading.
+
+        :param raw_data: The data as a string."""
+        data: Dict[str, Any] = json.loads(raw_data)
+        self._items = data.get('items', [])
+        self._claimed_by = data.get('claimed_by', None)
+        self._spawn_tick = data.get('spawn_tick', SPAWN_TICK)
+        self._simulated_tick = data.get('simulated_tick', None)
+        for e in list(self._enemies):
+            self._unindex(e)
+        self._enemies = []
+        for internal_name, hp in data.get('enemies', []):
+            e = self.spawn(internal_name)
+            e._current_hp = hp
 
     def generate(self):
-        height = snoise2(
-            self._x / HEIGHT_SCALE,
-            self._z / HEIGHT_SCALE,
-            octaves=6,
-            lacunarity=2,
-            persistence=0.5) * 100 + 30
-        trees = snoise2(
-            (self._x + 1000) / TREE_SCALE,
-            (self._z + 1000) / TREE_SCALE,
-            octaves=4,
-            lacunarity=2,
-            persistence=0.5
-        ) * 100
-        if height < 0:
-            self._biome = 'sea'
-        elif height > 60:
-            self._biome = 'mountain'
-        else:
-            if trees > 0:
-                self._biome = 'forest'
-            else:
-                self._biome = 'plains'
+        self._biome = get_biome(self._x, self._z)
+
+    def hibernate(self):
+        """Called when the last character leaves the cell, the cell is kept as
+        is but its timers stop and enemies stop targeting the characters which
+        have left."""
+        if self._spawn_timer is not None:
+            self._spawn_tick = TIMER_WHEEL.remaining(self._spawn_timer)
+            self._spawn_timer.cancel()
+            self._spawn_timer = None
+        self._simulated_tick = TIMER_WHEEL.world_tick
+        for e in self._enemies:
+            e._target = None
+            e.unschedule()
 
     def add_item(self, item: Tuple[str, Dict[str, str]]):
         self._items.append(item)
+        self._item_views = None
+
+    def remove_item_at(self, slot: int) -> Optional[Tuple[str, Dict[str, str]]]:
+        """Removes the item at the given position within the cell.
+
+        :param slot: The position of the item."""
+        if slot >= len(self._items):
+            return None
+        self._item_views = None
+        return self._items.pop(slot)
 
     @property
     def biome_icon(self):
-        if self._biome == 'forest':
-            return '\x1b[32m"\uFE0E\x1b[0m'
-        elif self._biome == 'mountain':
-            return '\x1b[90m^\x1b[0m'
-        elif self._biome == 'plains':
-            return '\x1b[32m.\x1b[0m'
-        return '\x1b[34m~\x1b[0m'
+        return get_biome_icon(self._biome)
 
     @property
     def population_icon(self):
-        if len(self._characters) >= 20:
-            return '█'
-        elif len(self._characters) >= 10:
-            return '▓'
-        elif len(self._characters) >= 5:
-            return '▒'
-        elif len(self._characters) >= 1:
-            return '░'
-        return '.'
-
-    def get_scavenge_item(self) -> Optional[Tuple[str, Dict[str, str]]]:
-        scavenge_list = self._get_scavenge_list()
-        if scavenge_list is None:
-            return None
-        item = random.choice(scavenge_list)
-        return [item[0], item[1]]
+        return get_population_icon(len(self._characters))
 
-    def _get_scavenge_list(self) -> Optional[List[Tuple[str, Dict[str, str]]]]:
-        """Generates the list of items that can be scavenged."""
-        if self._biome not in BIOME_DATA:
+    def get_scavenge_item(self, character: 'Character') -> Optional[Tuple[str, Dict[str, str]]]:
+        """Picks an item which can be scavenged within the biome.
+
+        :param character: The character which is scavenging."""
+        table = BIOME_TABLES.get(self._biome)
+        if table is None or table.scavenge is None:
             return None
-        return BIOME_DATA[self._biome]['scavenge']
+        return table.scavenge.sample().roll(character)
 
     def get(self, target_id: str) -> Optional[Union[Enemy, 'Character']]:
-        if target_id[-2:] == '00':
-            return next(
-                iter(
-                    [e for e in self._characters
-                     if e._instance_id == target_id]))
-        elif target_id[-2:] == '01':
-            return next(
-                iter(
-                    [e for e in self._enemies
-                     if e.id == target_id and not e.is_dead]),
-                None)
-        return None
+        """Gets a character or living enemy within the cell by its instance
+        id.
+
+        :param target_id: The instance id of the entity."""
+        entity = self._entities.get(target_id)
+        if isinstance(entity, Enemy) and entity.is_dead:
+            return None
+        return entity
+
+    def add_character(self, character: 'Character'):
+        """Adds a character to the cell.
+
+        :param character: The character to add."""
+        if character._instance_id in self._entities:
+            return
+        self._characters.append(character)
+        self._entities[character._instance_id] = character
+
+    def remove_character(self, character: 'Character'):
+        """Removes a character from the cell.
+
+        :param character: The character to remove."""
+        if self._entities.get(character._instance_id) is not character:
+            return
+        self._characters.remove(character)
+        del self._entities[character._instance_id]
 
     def find(self, target: str) -> List[Enemy]:
         """Attempts to find a target within the current cell, this can return
-        multiple targets which should then be reduced with an ordinal.
+        multiple targets which should then be reduced with an ordinal. The
+        targets are in the order they spawned, the list is the cell's index
+        so must not be modified.
 
-        This should handle external names and convert them to internal names
-        too."""
-        targets: List[Enemy] = []
-        for e in self._enemies:
-            if e.name.lower() == target.lower():
-                targets.append(e)
-        return targets
+        :param target: The name of the target, in any case."""
+        return self._by_name.get(target.lower(), [])
+
+    def find_one(self, target: str, ordinal: int = 1) -> Optional[Enemy]:
+        """Finds a single target within the cell by its name and ordinal.
+
+        :param target: The name of the target, in any case.
+        :param ordinal: The position of the target amongst those with the
+                        same name, starting at 1."""
+        targets = self.find(target)
+        if ordinal < 1 or ordinal > len(targets):
+            return None
+        return targets[ordinal - 1]
+
+    def find_collective(self, collective_id: str) -> List[Enemy]:
+        """Finds every enemy within the cell which belongs to a collective,
+        such as rabbits. The list is the cell's index so must not be modified.
+
+        :param collective_id: The id of the collective."""
+        return self._by_collective.get(collective_id, [])
 
     def spawn(self, enemy: str) -> Enemy:
         """Spawns an enemy within the Cell."""
         e = Enemy(self, enemy)
         self._enemies.append(e)
+        self._entities[e.id] = e
+        self._by_name.setdefault(e.name.lower(), []).append(e)
+        self._by_collective.setdefault(
+            e.data['collective_id'], []).append(e)
         return e
 
+    def _unindex(self, e: Enemy):
+        self._entities.pop(e.id, None)
+        for index, key in ((self._by_name, e.name.lower()),
+                           (self._by_collective, e.data['collective_id'])):
+            targets = index.get(key, [])
+            if e not in targets:
+                continue
+            targets.remove(e)
+            if not targets:
+                del index[key]
+
     def remove(self, e: Enemy):
         self._enemies.remove(e)
+        self._unindex(e)
+        e.unschedule()
+        if self._spawn_timer is None and self._characters:
+            self.schedule_spawn(0)
+
+    @property
+    def simulated_tick(self) -> int:
+        """The world tick the cell has been simulated up to, which is the
+        current tick unless the cell is hibernating."""
+        if self._simulated_tick is not None:
+            return self._simulated_tick
+        return TIMER_WHEEL.world_tick
+
+    @property
+    def spawn_tick(self) -> int:
+        if self._spawn_timer is not None:
+            return TIMER_WHEEL.remaining(self._spawn_timer)
+        return self._spawn_tick
 
     @property
     def description(self) -> str:
@@ -192,7 +401,8 @@ class Cell:
 
     @property
     def can_scavenge(self) -> bool:
-        return self._get_scavenge_list is not None
+        table = BIOME_TABLES.get(self._biome)
+        return table is not None and table.scavenge is not None
 
     @property
     def entities(self) -> List[Union['Character',Enemy]]:
@@ -207,8 +417,13 @@ class Cell:
         return self._enemies
     
     @property
-    def items(self) -> List[str]:
-        return [Item.get_item_properties(item) for item in self._items]
+    def items(self) -> List[Dict[str, Any]]:
+        """The properties of the items within the cell, these are cached until
+        the items change so must not be modified."""
+        if self._item_views is None:
+            self._item_views = [
+                Item.get_item_properties(item) for item in self._items]
+        return self._item_views
 
     @property
     def data(self) -> Dict[str, Any]:
@@ -0,0 +1,155 @@
+import asyncio
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Set, Tuple
+from model import get_cell_coordinates, get_cell_data, save_cells
+from .cell import Cell
+
+logger = logging.getLogger(__name__)
+
+CELL_SAVE_INTERVAL = 50
+CELL_SAVE_BATCH_SIZE = 200
+
+
+class CellStore:
+    """The CellStore persists the state of cells once they are unloaded.
+
+    Saves are queued and coalesced by coordinate so a cell which is unloaded
+    many times between writes is only written once, the queue is then written
+    in batches from a background thread so the game tick never waits on the
+    database. Cells are read on the same thread before they are loaded, and
+    other writes such as character saves can be run on it too."""
+    _pending: Dict[Tuple[int, int], str]
+    _saving: Dict[Tuple[int, int], str]
+    _fetched: Dict[Tuple[int, int], Optional[str]]
+    _saved: Set[Tuple[int, int]]
+    _lock: threading.Lock
+    _executor: ThreadPoolExecutor
+    _flushing: Optional[Future]
+    _ticks: int
+
+    def __init__(self):
+        self._pending = {}
+        self._saving = {}
+        self._fetched = {}
+        self._saved = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix='cell-store')
+        self._flushing = None
+        self._ticks = 0
+
+    def load_index(self):
+        """Loads the coordinates of every saved cell, this means cells which
+        have never been saved don't need to query the database when loaded."""
+        self._saved = set(get_cell_coordinates())
+        logger.info('found %s saved cells', len(self._saved))
+
+    def queue(self, cell: Cell):
+        """Queues the state of a cell to be saved.
+
+        :param cell: The cell to save."""
+        coordinate = (cell._x, cell._z)
+        with self._lock:
+            self._pending[coordinate] = cell.to_json()
+            self._fetched.pop(coordinate, None)
+            self._saved.add(coordinate)
+
+    def _needs_read(self, coordinate: Tuple[int, int]) -> bool:
+        return (coordinate in self._saved
+                and coordinate not in self._pending
+                and coordinate not in self._saving
+                and coordinate not in self._fetched)
+
+    async def fetch(self, x: int, z: int):
+        """Reads the saved state of the cell at the given coordinate on the
+        writer thread, so that loading it doesn't wait on the database.
+
+        :param x: The x coordinate of the cell.
+        :param z: The z coordinate of the cell."""
+        coordinate = (x, z)
+        with self._lock:
+            if not self._needs_read(coordinate):
+                return
+        data = await asyncio.wrap_future(
+            self._executor.submit(get_cell_data, x, z))
+        with self._lock:
+            if self._needs_read(coordinate):
+                self._fetched[coordinate] = data
+
+    def load(self, x: int, z: int) -> Optional[str]:
+        """Gets the saved state of the cell at the given coordinate, states
+        which haven't been written yet are used before the database. The cell
+        should be fetched first, otherwise the database is read on the
+        calling thread.
+
+        :param x: The x coordinate of the cell.
+        :param z: The z coordinate of the cell."""
+        coordinate = (x, z)
+        with self._lock:
+            if coordinate in self._pending:
+                return self._pending[coordinate]
+            if coordinate in self._saving:
+                return self._saving[coordinate]
+            if coordinate in self._fetched:
+                return self._fetched.pop(coordinate)
+            if coordinate not in self._saved:
+                return None
+        return get_cell_data(x, z)
+
+    def run(self, func: Callable[..., Any], *args) -> Future:
+        """Runs a database call on the writer thread after the writes already
+        queued on it, failures are logged.
+
+        :param func: The function to call.
+        :param *args: The arguments to call it with."""
+        return self._executor.submit(self._run_logged, func, *args)
+
+    def _run_logged(self, func: Callable[..., Any], *args):
+        try:
+            return func(*args)
+        except Exception as e:
+            logger.error('failed to run %s on the cell store', func.__name__)
+            logger.exception(e)
+            raise
+
+    def tick(self):
+        """Called each tick, begins writing the queued cells in the background
+        every CELL_SAVE_INTERVAL ticks."""
+        self._ticks += 1
+        if self._ticks >= CELL_SAVE_INTERVAL:
+            self._ticks = 0
+            self.flush()
+
+    def flush(self, wait: bool = False):
+        """Writes the queued cells in the background, if a write is already in
+        progress the queue is left for the next flush.
+
+        :param wait: Whether to wait for the queued cells to be written."""
+        if not wait and self._flushing is not None and not self._flushing.done():
+            return
+        self._flushing = self._executor.submit(self._write_pending)
+        if wait:
+            self._flushing.result()
+
+    def _write_pending(self):
+        with self._lock:
+            batch, self._pending = self._pending, {}
+            self._saving = batch
+        if not batch:
+            return
+        rows = [(x, z, data) for (x, z), data in batch.items()]
+        try:
+            for i in range(0, len(rows), CELL_SAVE_BATCH_SIZE):
+                save_cells(rows[i:i + CELL_SAVE_BATCH_SIZE])
+            logger.info('saved %s cells', len(rows))
+        except Exception as e:
+            logger.error('failed to save %s cells, retrying next flush', len(rows))
+            logger.exception(e)
+            with self._lock:
+                for coordinate, data in batch.items():
+                    self._pending.setdefault(coordinate, data)
+        finally:
+            with self._lock:
+                self._saving = {}
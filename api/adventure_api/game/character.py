@@ -1,14 +1,21 @@
+import asyncio
 import json
+import os
 import random
 import logging
+import shlex
+from concurrent.futures import Future
 from fastapi import WebSocket
 from typing import Any, Dict, List, Optional, Tuple, TYPE_CHECKING
 
-from .commands import BasicCommands, CharacterCommands, ChatCommands, CombatCommands, CommandHandler, IntroCommands, ItemCommands, WorldCommands
+from .commands import BASE_HANDLERS, STATE_HANDLERS, CommandHandler
 from .colors import replace_colors
+from .sentence import SentenceHandler, SentenceParseError
 from .world import World
 from .item import Item
+from .timer_wheel import TIMER_WHEEL, Timer
 from config import get_conn
+from model import save_user_character
 from util import generate_id, EXP_TABLE
 
 if TYPE_CHECKING:
@@ -51,6 +58,7 @@ Type "@lbl@begin@res@" followed by your character name to start.
 
 SCAVENGE_TIMER = 1
 SCAVENGE_CHANCE = 0.6
+OUTBOX_SIZE = int(os.environ.get('OUTBOX_SIZE', 256))
 
 
 class Character:
@@ -66,14 +74,18 @@ class Character:
     _z: int
     _cell: Optional['Cell']
     _inventory: List[Tuple[str, Dict[str, str]]]
+    _inventory_views: Optional[List[Dict[str, Any]]]
     _action: Optional[str]
     _action_timer: int
+    _scheduled: Optional[Timer]
     _attributes: Dict[str, Tuple[int, int]]
     _skills: Dict[str, Tuple[int, int]]
     _command_handler: CommandHandler
     _target: Optional[str]
     _disconnected: bool
     _settings: Dict[str, str]
+    _outbox: 'asyncio.Queue[Dict[str, Any]]'
+    _writer: Optional['asyncio.Task']
 
     def __init__(self, id: str, ws: WebSocket, session_id: str):
         """Constructs the Character
@@ -85,13 +97,17 @@ class Character:
         self._ws = ws
         self._session_id = session_id
         self._disconnected = False
+        self._outbox = asyncio.Queue(OUTBOX_SIZE)
+        self._writer = None
         self._state = 'intro'
         self._name = None
         self._x = 0
         self._z = 0
         self._action = None
         self._action_timer = 0
+        self._scheduled = None
         self._inventory = []
+        self._inventory_views = None
         self._cell = None
         self._hp = 10
         self._attributes = dict(
@@ -102,7 +118,6 @@ class Character:
         )
         self._skills = dict()
         self._command_handler = CommandHandler(self)
-        self._command_handler.add_command_handler(BasicCommands())
         self.load_character()
         self.set_state(self._state)
 
@@ -120,8 +135,43 @@ class Character:
             if send_motd:
                 await self.send_message('game', '{}\n\nWelcome back, @lgr@{}@res@.\nType \"@lbl@help@res@\" to see available commands.\n\n', TITLE, self._name)
                 await self.send_message('chat', '@lgr@You are connected to the global chat channel.@res@\n')
+            await World.fetch_cell(self._x, self._z)
             self._cell = World.load_cell(self._x, self._z, self)
 
+    async def handle_client_input(self, data: Dict[str, Any]):
+        """Handles a message received from the client, either input to run or
+        a request for an autocomplete suggestion.
+
+        :param data: The message received from the client."""
+        try:
+            command = shlex.split(data['data'])
+        except ValueError:
+            command = data['data'].split(" ")
+        except KeyError:
+            command = ['']
+        if len(data.get('data', '')) > 0 and data['data'].split(' ')[-1] == '':
+            command.append('')
+        if data['type'] == 'autocomplete_suggest':
+            suggestion = self.command_handler.get_suggestion(command)
+            self.queue_message(dict(type='suggestion', data=suggestion))
+        elif data['type'] == 'autocomplete_get':
+            suggestion = self.command_handler.get_suggestion(command, True)
+            self.queue_message(dict(type='autocomplete', data=suggestion))
+        elif data['type'] == 'game':
+            if self._settings.get('input', 'command') == 'command':
+                logger.info('handling command [%s] for [%s]', data['data'], self._name)
+                await self.command_handler.handle_input(command)
+            elif self._settings.get('input', 'command') == 'sentence':
+                logger.info('handling sentence [%s] for [%s]', data['data'], self._name)
+                try:
+                    await SentenceHandler.parse_sentence(self, data['data'])
+                except SentenceParseError as e:
+                    self.queue_message(dict(type='game', data=str(e)))
+            else:
+                logger.error('unknown input type [%s]', self._settings.get('input', 'command'))
+        elif data['type'] == 'ping':
+            self.queue_message(dict(type='pong', data=''))
+
     async def handle_logout(self):
         """Handles the user leaving the websocket."""
         if self._state == 'intro':
@@ -129,23 +179,19 @@ class Character:
         World.unload_cell(self._x, self._z, self)
 
     async def tick(self):
-        """Handles the game tick, the tick is every 600ms and is used so that
-        actions which are repeating can be done until the player is done."""
-        if self._action_timer > 0:
-            self._action_timer = self._action_timer - 1
-            return
+        """Handles the game tick, the character is only woken when its action
+        timer is due and is used so that actions which are repeating can be
+        done until the player is done."""
+        self._scheduled = None
+        self._action_timer = 0
         if self._cell is None:
             return
         if self._action == 'scavenge':
             if random.random() > SCAVENGE_CHANCE:
-                item = self._cell.get_scavenge_item()
-                
-                for k, v in item[1].items():
-                    if v.startswith('script:'):
-                        fn = getattr(Item, v[7:])
-                        item[1][k] = fn(character=self)
-
-                if self.add_item(*item):
+                item = self._cell.get_scavenge_item(self)
+                if item is None:
+                    self._action = None
+                elif self.add_item(*item):
                     aan = 'an' if Item.get_display_name(item).lower()[0] in 'aeiou' else 'a'
 
                     await self.send_message('game', 'You find {} @yel@{}@res@', aan, Item.get_display_name(item))
@@ -198,6 +244,30 @@ class Character:
                 self._target = None
                 self._action = None
             self._action_timer = 3
+        self.schedule_action()
+
+    def schedule_action(self, reset: bool = False):
+        """Schedules the character to be woken when its action timer is due,
+        the character is only scheduled while it has an action or is waiting
+        on its action timer.
+
+        :param reset: Whether to restart the timer from the current action
+            timer rather than keeping the existing one."""
+        if self._scheduled is not None:
+            if not reset:
+                return
+            self._scheduled.cancel()
+            self._scheduled = None
+        if self._action is None and self._action_timer <= 0:
+            return
+        self._scheduled = TIMER_WHEEL.schedule(
+            self._action_timer + 1, self.tick)
+
+    def unschedule(self):
+        """Stops the character's action timer."""
+        if self._scheduled is not None:
+            self._scheduled.cancel()
+            self._scheduled = None
 
     async def process_script(self, script: List[Any], *args, **kwargs):
         """Processes a script for the character.
@@ -237,11 +307,13 @@ class Character:
             if c._id != self._id:
                 await c.send_message('game', '@red@{}@res@ has died.', self._name)
         self._inventory = []
+        self._inventory_views = None
         self._hp = self._attributes['constitution'][0]
         self._target = None
         self._action = None
         self._action_timer = 0
-        self.move(0, 0)
+        self.unschedule()
+        await self.move(0, 0)
 
     async def set_action(self, action: Optional[str]):
         """Sets the players current action, if the action is currently set then
@@ -266,12 +338,14 @@ class Character:
         if self._action == 'attack':
             await self.send_message('game', 'You stop attacking the @red@{}@res@.\n', self.target.name)
             self._target = None
+        self._action = action
         if action == 'scavenge':
             await self.send_message('game', 'You begin scavenging for whatever you can find.\n')
             self._action_timer = SCAVENGE_TIMER
+            self.schedule_action(reset=True)
         elif action == 'attack':
             await self.send_message('game', 'You begin attacking the @red@{}@res@\n', self.target.name)
-        self._action = action
+        self.schedule_action()
 
     async def send_message(self, type: str, message: str, *args, **kwargs):
         """Sends a message to the Characters connected WebSocket.
@@ -283,7 +357,39 @@ class Character:
         if self._ws is None or self._ws.client_state.value != 1:
             return
         message = replace_colors(message.format(*args, **kwargs))
-        await self._ws.send_json(dict(type=type, data=message))
+        self.queue_message(dict(type=type, data=message))
+
+    def queue_message(self, message: Dict[str, Any]):
+        """Queues a message to be sent by the writer, so the game never waits
+        on a slow WebSocket. Messages are dropped if the outbox is full.
+
+        :param message: The message to send."""
+        try:
+            self._outbox.put_nowait(message)
+        except asyncio.QueueFull:
+            logger.warning('outbox full for [%s], dropping message', self._id)
+
+    def start_writer(self):
+        """Starts sending queued messages to the current WebSocket, replacing
+        the writer of any previous connection."""
+        self.stop_writer()
+        self._writer = asyncio.create_task(self._write_messages(self._ws))
+
+    def stop_writer(self):
+        """Stops sending queued messages, any unsent messages are kept for
+        the next connection."""
+        if self._writer is not None:
+            self._writer.cancel()
+            self._writer = None
+
+    async def _write_messages(self, ws: WebSocket):
+        while True:
+            message = await self._outbox.get()
+            try:
+                await ws.send_json(message)
+            except Exception as e:
+                logger.debug('unable to send message to [%s]: %s', self._id, e)
+                return
     
     async def set_setting(self, setting: str, value: str):
         """Sets a setting for the character.
@@ -294,30 +400,16 @@ class Character:
         self._settings[setting] = value
         if self._ws is None or self._ws.client_state.value != 1:
             return
-        await self._ws.send_json(dict(type='setting', setting=setting, value=value))
+        self.queue_message(dict(type='setting', setting=setting, value=value))
         self.save_character()
 
     def set_state(self, state: str):
         """Sets the state of this character.
 
         :param state: The state to set the character in."""
-        if self._state == 'intro':
-            self._command_handler.remove_command_handler(IntroCommands)
-        elif self._state == 'adventure':
-            self._command_handler.remove_command_handler(CharacterCommands)
-            self._command_handler.remove_command_handler(WorldCommands)
-            self._command_handler.remove_command_handler(ChatCommands)
-            self._command_handler.remove_command_handler(CombatCommands)
-            self._command_handler.remove_command_handler(ItemCommands)
         self._state = state
-        if self._state == 'adventure':
-            self._command_handler.add_command_handler(CharacterCommands())
-            self._command_handler.add_command_handler(WorldCommands())
-            self._command_handler.add_command_handler(ChatCommands())
-            self._command_handler.add_command_handler(CombatCommands())
-            self._command_handler.add_command_handler(ItemCommands())
-        elif self._state == 'intro':
-            self._command_handler.add_command_handler(IntroCommands())
+        self._command_handler.set_command_handlers(
+            STATE_HANDLERS.get(state, BASE_HANDLERS))
         self.save_character()
 
     async def start_attacking(self, target_id: str):
@@ -328,6 +420,7 @@ class Character:
             return
         self._target = target_id
         await self.set_action('attack')
+        self.schedule_action()
         if len(self._cell.characters) > 1:
             for c in self._cell.characters:
                 if c._id != self._id:
@@ -339,6 +432,7 @@ class Character:
         if self.free_slots - item['slots_taken'] < 0:
             return False
         self._inventory.append((item_id, qualifiers))
+        self._inventory_views = None
         return True
 
     def remove_item_at(self, slot: int):
@@ -346,22 +440,29 @@ class Character:
             return
         item = self._inventory[slot]
         del self._inventory[slot]
+        self._inventory_views = None
         return item
 
-    def move(self, x: int, z: int):
+    async def move(self, x: int, z: int):
         """Moves to the specified cell.
 
         :param x: The x coordinate.
         :param z: The z coordinate."""
+        if World.owns(x, z):
+            await World.fetch_cell(x, z)
         ox, oz = self._x, self._z
         self._x = x
         self._z = z
         World.unload_cell(ox, oz, self)
+        if not World.owns(x, z):
+            self._cell = None
+            await World.hand_off(self)
+            return
         self._cell = World.load_cell(x, z, self)
 
     def to_json(self) -> str:
         """Converts the character to JSON for saving."""
-        return json.dumps(dict(hp=self._hp, inventory=self._inventory, attributes=self._attributes, skills=self._skills, action_timer=self._action_timer, settings=self._settings))
+        return json.dumps(dict(hp=self._hp, inventory=self._inventory, attributes=self._attributes, skills=self._skills, action_timer=self.action_timer, settings=self._settings))
 
     def from_json(self, raw_data: Tuple[str, int, int, str, str]):
         """Converts the character back from JSON for loading.
@@ -374,6 +475,7 @@ class Character:
         data: Dict[str, Any] = json.loads(raw_data[4])
         self._hp = data.get('hp', self._hp)
         self._inventory = data.get('inventory', [])
+        self._inventory_views = None
         self._attributes = data.get('attributes', self._attributes)
         self._skills = data.get('skills', self._skills)
         self._action_timer = data.get('action_timer', self._action_timer)
@@ -405,24 +507,16 @@ class Character:
             if data:
                 self.from_json(data)
 
-    def save_character(self):
-        """Saves the character using the current database driver."""
-        driver, conn = get_conn()
-        if driver == 'sqlite':
-            try:
-                conn.execute(
-                    'UPDATE USERS SET name = ?, x = ?, z = ?, state = ?, additional_data = ? WHERE id = ?', [
-                        self._name, self._x, self._z, self._state, self.to_json(), self._id])
-                conn.commit()
-            finally:
-                conn.close()
-        elif driver == 'postgres':
-            with conn.cursor() as cur:
-                cur.execute(
-                    'UPDATE users SET name = %s, x = %s, z = %s, state = %s, additional_data = %s WHERE id = %s', [
-                        self._name, self._x, self._z, self._state, self.to_json(), self._id])
-                conn.commit()
-        logger.info('saved character [%s] [%s]', self._id, self._name)
+    def save_character(self) -> Future:
+        """Saves the character in the background on the cell store's writer
+        thread, saves are written in the order they are made.
+
+        :return: A future which is done once the save has been written."""
+        future = World._cell_store.run(
+            save_user_character, self._id, self._name, self._x, self._z,
+            self._state, self.to_json())
+        logger.info('queued save of character [%s] [%s]', self._id, self._name)
+        return future
 
     def get_skill_level(self, name: str) -> int:
         return self._skills.get(name, (1, 0))[0]
@@ -463,8 +557,19 @@ class Character:
         return self._cell.get(self._target)
 
     @property
-    def inventory(self):
-        return [Item.get_item_properties(item) for item in self._inventory]
+    def action_timer(self) -> int:
+        if self._scheduled is not None:
+            return max(0, TIMER_WHEEL.remaining(self._scheduled) - 1)
+        return self._action_timer
+
+    @property
+    def inventory(self) -> List[Dict[str, Any]]:
+        """The properties of the items in the inventory, these are cached until
+        the inventory changes so must not be modified."""
+        if self._inventory_views is None:
+            self._inventory_views = [
+                Item.get_item_properties(item) for item in self._inventory]
+        return self._inventory_views
 
     @ property
     def command_handler(self):
@@ -481,3 +586,47 @@ class Character:
     @property
     def coordinate_str(self) -> str:
         return f'{self._x},{self._z}'
+
+
+async def connect_character(id: str, ws: WebSocket, session_id: str,
+                            handed_off: bool = False) -> Character:
+    """Connects a user to their character, reusing the character if it is
+    still in the world from an earlier connection.
+
+    :param id: The user id.
+    :param ws: The websocket the user is connected with.
+    :param session_id: The session of the connection.
+    :param handed_off: Whether the character has just been handed off from
+        another shard rather than logging in."""
+    character = World.get_player_by_id(id, True)
+    if not character:
+        character = Character(id, ws, session_id)
+        character.start_writer()
+        if character.name and not handed_off:
+            await World.send_to_all('chat', '@lgr@{}@res@ has just logged in.\n', character.name)
+        World.add_player(character)
+        await character.handle_login(send_motd=not handed_off)
+    else:
+        continue_session = character._session_id == session_id
+        character._ws = ws
+        character._session_id = session_id
+        character._disconnected = False
+        character.start_writer()
+        World.add_player(character)
+        if continue_session:
+            await character.handle_login(send_motd=False)
+        else:
+            await character.handle_login()
+    return character
+
+
+def disconnect_character(character: Character, ws: WebSocket):
+    """Disconnects a character from the websocket, the character is kept in
+    the world for a while in case the user reconnects.
+
+    :param character: The character.
+    :param ws: The websocket which has disconnected."""
+    if character._ws is ws:
+        character.stop_writer()
+    character._disconnected = True
+    World.remove_player(character)
@@ -1,4 +1,4 @@
-from .base import autocomplete, command, CommandHandler
+from .base import autocomplete, command, handler_set, CommandHandler
 from .basic import BasicCommands
 from .combat import CombatCommands
 from .character import CharacterCommands
@@ -6,3 +6,11 @@ from .chat import ChatCommands
 from .intro import IntroCommands
 from .item import ItemCommands
 from .world import WorldCommands
+
+BASE_HANDLERS = handler_set(BasicCommands)
+STATE_HANDLERS = {
+    'intro': handler_set(BasicCommands, IntroCommands),
+    'adventure': handler_set(
+        BasicCommands, CharacterCommands, WorldCommands, ChatCommands,
+        CombatCommands, ItemCommands),
+}
@@ -3,15 +3,20 @@ import itertools
 import inspect
 import re
 from collections import OrderedDict
-from typing import Any, Callable, Iterable, List, Type, Union, TYPE_CHECKING
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Type, Union, TYPE_CHECKING
 
-from util import find_closest_match
+from util import BKTree, PrefixTrie, min_distance_threshold
 
 if TYPE_CHECKING:
     from ..character import Character
 
 DOC_STRING = r'\:\s*(.*?)\:\s*(.*?)\s*($|\n)'
 
+# The annotations of parameters which are passed in by the command handler
+# rather than the player, for annotations given as types and as strings.
+TYPE_INJECTIONS = {'CommandHandler': 'handler', 'Character': 'character'}
+STR_INJECTIONS = {'Character': 'character', 'Cell': 'cell'}
+
 
 def _parse_documentation(fn: Callable):
     """Parses the command documentation and returns a dictionary of values which
@@ -99,21 +104,68 @@ def _parse_command_help_params(f, doc):
     return response
 
 
+def _parse_injection_plan(f: Callable):
+    """Works out which values the command handler passes into the function
+    before the player's arguments, along with the least and most arguments the
+    player can give. This is done once when the function is decorated so that
+    calling it is only a matter of building the argument list.
+
+    This should return a tuple that looks like:
+    (('character', 'cell'), 1, 2)
+
+    :param f: The function to parse."""
+    raw_arg_list = list(inspect.signature(f).parameters.values())
+    if raw_arg_list and raw_arg_list[0].name == 'self':
+        raw_arg_list = raw_arg_list[1:]
+    plan = []
+    for param in raw_arg_list:
+        if not param.annotation:
+            break
+        if isinstance(param.annotation, type):
+            injection = TYPE_INJECTIONS.get(param.annotation.__name__)
+        elif isinstance(param.annotation, str):
+            injection = STR_INJECTIONS.get(param.annotation)
+        else:
+            break
+        if injection:
+            plan.append(injection)
+    min_args = 0
+    max_args: Optional[int] = 0
+    for param in raw_arg_list[len(plan):]:
+        if param.kind == inspect.Parameter.VAR_POSITIONAL:
+            max_args = None
+        elif param.kind in (inspect.Parameter.POSITIONAL_ONLY,
+                            inspect.Parameter.POSITIONAL_OR_KEYWORD):
+            if param.default is inspect.Parameter.empty:
+                min_args += 1
+            if max_args is not None:
+                max_args += 1
+    return tuple(plan), min_args, max_args
+
+
 def command(f):
     """Wrapper for a function which is a command."""
     doc = _parse_documentation(f)
     doc_params = _parse_command_help_params(f, doc)
-    setattr(f, '__command__', dict(func=f, doc_param=doc_params, **doc))
+    plan, min_args, max_args = _parse_injection_plan(f)
+    setattr(f, '__injection__', plan)
+    setattr(f, '__command__', dict(
+        func=f, doc_param=doc_params, min_args=min_args, max_args=max_args,
+        **doc))
     return f
 
 
-def autocomplete(obj: str):
+def autocomplete(obj: str, static: bool = False):
     """Wrapper for a function which designates the a category of items available
     for autocompletion.
 
-    :param obj: The object to handle autocompletion data for."""
+    :param obj: The object to handle autocompletion data for.
+    :param static: Whether the suggestions are always the same for a set of
+                   command handlers, so they only need to be indexed once."""
     def _inner(f):
         setattr(f, '__autocomplete__', obj)
+        setattr(f, '__autocomplete_static__', static)
+        setattr(f, '__injection__', _parse_injection_plan(f)[0])
         return f
     return _inner
 
@@ -124,45 +176,232 @@ def aliases(f):
     return f
 
 
+_SHARED_HANDLERS: Dict[Type, Any] = {}
+
+
+def handler_set(*handlers: Type) -> Tuple[Any, ...]:
+    """Returns the shared instances of the given command handler types, these
+    are created once for the process as command handlers hold no state of
+    their own, so every character can use the same ones.
+
+    :param handlers: The command handler types, in the order they are
+                     searched."""
+    for handler in handlers:
+        if handler not in _SHARED_HANDLERS:
+            _SHARED_HANDLERS[handler] = handler()
+    return tuple(_SHARED_HANDLERS[handler] for handler in handlers)
+
+
+class CompletionIndex:
+    """The suggestions of the autocompletion handlers for a parameter, in
+    order without duplicates.
+
+    Indexes which are kept in the command table also build a trie to find the
+    first suggestion starting with the input and the position of each
+    suggestion for cycling through them. The suggestions of dynamic handlers
+    change with every input, so their index is only scanned once and is not
+    worth building."""
+    raw: List[str]
+    _suggestions: List[str]
+    _alternative: Optional[List[str]]
+    _raw_positions: Optional[Dict[str, int]]
+    _alternative_positions: Optional[Dict[str, int]]
+    _trie: Optional[PrefixTrie]
+
+    def __init__(self, suggestions: List[str], indexed: bool = False):
+        """Constructs the CompletionIndex.
+
+        :param suggestions: The suggestions of the autocompletion handlers.
+        :param indexed: Whether to build the trie and positions, for an index
+                        which is reused."""
+        self.raw = list(OrderedDict.fromkeys(suggestions))
+        self._suggestions = suggestions
+        self._alternative = None
+        self._raw_positions = None
+        self._alternative_positions = None
+        self._trie = None
+        if indexed:
+            self._raw_positions = {s: i for i, s in enumerate(self.raw)}
+            self._alternative_positions = {
+                s: i for i, s in enumerate(self.alternative)}
+            self._trie = PrefixTrie(self.raw)
+
+    @property
+    def alternative(self) -> List[str]:
+        """The suggestions with any quotes removed, without duplicates."""
+        if self._alternative is None:
+            self._alternative = list(OrderedDict.fromkeys(
+                s[1: -1] if len(s) > 2 and s[0] == '"' and s[-1] == '"' else s
+                for s in self._suggestions))
+        return self._alternative
+
+    def first(self, prefix: str) -> str:
+        """Returns the first suggestion which starts with the prefix, or an
+        empty string if there are none.
+
+        :param prefix: The input to complete."""
+        if self._trie is not None:
+            return self._trie.first(prefix) or ''
+        for s in self.raw:
+            if s.startswith(prefix):
+                return s
+        return ''
+
+    def position(self, suggestion: str, alternative: bool = False) -> Optional[int]:
+        """Returns the position of a suggestion, or None if it is not one.
+
+        :param suggestion: The suggestion to find.
+        :param alternative: Whether to find it amongst the alternatives."""
+        if self._trie is not None:
+            positions = (self._alternative_positions if alternative
+                         else self._raw_positions)
+            return positions.get(suggestion)
+        suggestion_list = self.alternative if alternative else self.raw
+        try:
+            return suggestion_list.index(suggestion)
+        except ValueError:
+            return None
+
+
+class CommandTable:
+    """The commands, aliases and autocompletion handlers of a composition of
+    command handler types. Tables are compiled once per composition and shared
+    by every CommandHandler with the same handler types, the handlers are
+    referred to by their position so each character can use its own
+    instances.
+
+    Alias providers are called once when the table is compiled, so they must
+    not depend on the state of the handler."""
+    _tables: Dict[Tuple[Type, ...], 'CommandTable'] = {}
+    commands: Dict[str, Tuple[int, Dict[str, Any]]]
+    aliases: Dict[str, str]
+    fuzzy: BKTree
+    command_trie: PrefixTrie
+    completions: Dict[Tuple[str, ...], CompletionIndex]
+    command_list: List[Dict[str, Any]]
+    _by_name: Dict[str, Dict[str, Any]]
+    _autocompleters: List[Tuple[int, Callable]]
+    _autocomplete_cache: Dict[Tuple[str, ...], List[Tuple[int, Callable]]]
+
+    def __init__(self, handlers: Sequence[Any]):
+        """Constructs the CommandTable.
+
+        :param handlers: The command handlers to compile the table from."""
+        self.commands = {}
+        self.aliases = {}
+        self.command_list = []
+        self._by_name = {}
+        self._autocompleters = []
+        self._autocomplete_cache = {}
+        self.completions = {}
+        for idx, handler in enumerate(handlers):
+            for k, v in handler.__class__.__dict__.items():
+                if getattr(v, '__command__', None) is not None:
+                    self.commands[k] = (idx, v.__command__)
+                    self.command_list.append(v.__command__)
+                    self._by_name.setdefault(v.__command__['func'].__name__, v.__command__)
+                if getattr(v, '__autocomplete__', None) is not None:
+                    self._autocompleters.append((idx, v))
+                if getattr(v, '__alias__', None):
+                    self.aliases.update(v(handler))
+        self.command_list.sort(key=lambda x: x['func'].__name__)
+        # Aliases as short as their distance threshold would match almost any
+        # short input, so only the longer aliases are suggested.
+        self.fuzzy = BKTree(list(self.commands) + [
+            alias for alias in self.aliases
+            if len(alias) > min_distance_threshold(len(alias))])
+        self.command_trie = PrefixTrie(self.commands)
+
+    @classmethod
+    def for_handlers(cls, handlers: Sequence[Any]) -> 'CommandTable':
+        """Gets the table for the given command handlers, compiling it if it is
+        the first time this composition has been seen.
+
+        :param handlers: The command handlers."""
+        key = tuple(type(h) for h in handlers)
+        table = cls._tables.get(key)
+        if table is None:
+            table = cls._tables[key] = cls(handlers)
+        return table
+
+    def get_command(self, command: str) -> Optional[Dict[str, Any]]:
+        """Returns the command data for the given command name.
+
+        :param command: The name of the command."""
+        return self._by_name.get(command)
+
+    def get_autocompleters(self, obj: Iterable[str]) -> List[Tuple[int, Callable]]:
+        """Returns the autocompletion handlers for the given object types.
+
+        :param obj: The object types to autocomplete."""
+        key = tuple(obj)
+        fns = self._autocomplete_cache.get(key)
+        if fns is None:
+            fns = self._autocomplete_cache[key] = [
+                (idx, v) for idx, v in self._autocompleters
+                if v.__autocomplete__ in key]
+        return fns
+
+
 class CommandHandler:
     """The CommandHandler handles all the sub command handlers within the game.
     This means each system in the game can be compartmentalised into a single
     file."""
-    _handlers: List[Any]
+    _handlers: Tuple[Any, ...]
     _character: 'Character'
+    _table: Optional[CommandTable]
 
     def __init__(self, character: 'Character'):
-        self._handlers = []
+        self._handlers = ()
         self._character = character
+        self._table = None
+
+    def set_command_handlers(self, handlers: Tuple[Any, ...]):
+        """Replaces every command handler with a set of handlers, such as the
+        shared handler set of a state.
+
+        :param handlers: The command handlers."""
+        self._handlers = handlers
+        self._table = None
 
     def add_command_handler(self, handler: Any):
         """Adds a command handler.
 
         :param handler: The command handler."""
-        self._handlers.append(handler)
+        self._handlers = self._handlers + (handler,)
+        self._table = None
 
     def remove_command_handler(self, handler: Type):
         """Removes all types of a given command handler.
 
         :param handler: The command handler."""
-        self._handlers = [
+        self._handlers = tuple(
             h for h in self._handlers
             if not isinstance(h, handler)
-        ]
+        )
+        self._table = None
+
+    @property
+    def table(self) -> CommandTable:
+        """The compiled command table of the current command handlers."""
+        if self._table is None:
+            self._table = CommandTable.for_handlers(self._handlers)
+        return self._table
 
     async def handle_input(self, input: List[str]):
         """Invokes a command for the given input string."""
         if not input:
             return
-        command_list = self._get_command_list_internal()
+        table = self.table
+        command_list = table.commands
         if input[0].startswith('\\'):
             input[0] = input[0][1:]
             input = ['say'] + input
-        known_aliases = self._get_alias_handlers()
+        known_aliases = table.aliases
         if input[0] in known_aliases:
             input = known_aliases[input[0]].split(' ') + input[1:]
         if input[0] not in command_list:
-            closest = find_closest_match(input[0], command_list.keys())
+            closest = table.fuzzy.closest(input[0])
             if closest[0]:
                 await self._character.send_message(
                     'game', '@red@Unknown command, did you mean "@lbl@{}@red@"?@res@\n', closest[0])
@@ -170,49 +409,31 @@ class CommandHandler:
                 await self._character.send_message(
                     'game', '@red@Unable to find command@res@\n')
             return
-        try:
-            handler, command_data = command_list[input[0]]
-            arguments = self._build_initial_argument_list(command_data["func"])
-            await command_data['func'](handler, *(arguments + input[1:]))
-        except TypeError as e:
-            reg = re.compile(
-                f'{command_data["func"].__qualname__}\\(\\) takes (from )?\\d+ (to \\d )?positional arguments but \\d+ were given')
-            ureg = re.compile(
-                f'{command_data["func"].__qualname__}\\(\\) missing \\d+ required positional argument: \'.+\''
-            )
-            mul_reg = re.compile(
-                f'{command_data["func"].__qualname__}\\(\\) missing \\d+ required positional arguments: .+'
-            )
-            if reg.match(str(e)) or ureg.match(str(e)) or mul_reg.match(str(e)):
-                await self._character.send_message('game', '@lre@Invalid command usage, type "@lbl@help {}@lre@" for information on this command. @res@\n', input[0])
-            else:
-                raise
+        idx, command_data = command_list[input[0]]
+        handler = self._handlers[idx]
+        count = len(input) - 1
+        max_args = command_data['max_args']
+        if count < command_data['min_args'] or (
+                max_args is not None and count > max_args):
+            await self._character.send_message('game', '@lre@Invalid command usage, type "@lbl@help {}@lre@" for information on this command. @res@\n', input[0])
+            return
+        arguments = self._build_initial_argument_list(command_data['func'])
+        await command_data['func'](handler, *(arguments + input[1:]))
 
     def _build_initial_argument_list(self, func: Callable):
         """Builds a list of arguments which are first needed to be passed into
         a function to work, these are based on the argument type and allow
-        functions to be as basic as possible but accept the type they need."""
-        raw_arg_list = list(inspect.signature(func).parameters.items())
-        if not raw_arg_list:
-            return []
-        if raw_arg_list[0][0] == 'self':
-            raw_arg_list = raw_arg_list[1:]
+        functions to be as basic as possible but accept the type they need.
+        Which arguments are needed is worked out when the function is
+        decorated."""
         args: List[Any] = []
-        for name, param in raw_arg_list:
-            if not param.annotation:
-                break
-            if isinstance(param.annotation, type):
-                if param.annotation.__name__ == 'CommandHandler':
-                    args.append(self)
-                elif param.annotation.__name__ == 'Character':
-                    args.append(self._character)
-            elif isinstance(param.annotation, str):
-                if param.annotation == 'Character':
-                    args.append(self._character)
-                elif param.annotation == 'Cell':
-                    args.append(self._character._cell)
+        for injection in func.__injection__:
+            if injection == 'handler':
+                args.append(self)
+            elif injection == 'character':
+                args.append(self._character)
             else:
-                break
+                args.append(self._character._cell)
         return args
 
     def get_suggestion(self, cmd: List[str], alternative=False):
@@ -226,12 +447,10 @@ class CommandHandler:
         :param alternative: Whether to autocomplete to an alternative."""
         if not cmd or not cmd[0]:
             return ''
-        valid_functions = {
-            k: v[1] for k, v in self._get_command_list_internal().items()
-            if k.startswith(cmd[0])}
-        if not valid_functions:
+        table = self.table
+        name = table.command_trie.first(cmd[0])
+        if name is None:
             return ''
-        name, fn = list(valid_functions.items())[0]
         if cmd[0] != name:
             if len(cmd) == 1:
                 return name
@@ -239,95 +458,51 @@ class CommandHandler:
                 return ''
         if len(cmd) == 1:
             return ''
-        params = fn.get('params', None)
+        params = table.commands[name][1].get('params', None)
         if not params:
             return ''
         if len(cmd) - 1 > len(params):
             return ''
-        suggestion_funcs = self._get_autocomplete_handlers(
-            params
-            [len(cmd) - 2])
-        raw_suggestion_list: List[str] = []
-        suggestion_list: List[str] = []
-        for handler, suggestion_func in suggestion_funcs:
-            base_arguments = self._build_initial_argument_list(suggestion_func)
-            raw_suggestion_list.extend(
-                suggestion_func(
-                    handler, *(base_arguments + [cmd])))
-            if alternative:
-                suggestion_list = [
-                    s[1: -1]
-                    if len(s) > 2 and s[0] == '"' and s[-1] == '"' else s
-                    for s in raw_suggestion_list]
-            else:
-                suggestion_list = raw_suggestion_list
-        raw_suggestion_list = list(OrderedDict.fromkeys(raw_suggestion_list))
-        suggestion_list = list(OrderedDict.fromkeys(suggestion_list))
-        if cmd[-1] not in suggestion_list:
-            matching_suggestions = next((
-                suggestion
-                for suggestion in raw_suggestion_list
-                if suggestion.startswith(cmd[-1])
-            ), '')
-            return ' '.join(cmd[:-1]) + ' ' + matching_suggestions
+        index = self._get_completion_index(params[len(cmd) - 2], cmd)
+        position = index.position(cmd[-1], alternative)
+        if position is None:
+            return ' '.join(cmd[:-1]) + ' ' + index.first(cmd[-1])
         if not alternative:
             return ''
-        idx = suggestion_list.index(cmd[-1]) + 1
-        if idx == len(suggestion_list):
+        idx = position + 1
+        if idx == len(index.alternative):
             idx = 0
-        return ' '.join(cmd[:-1]) + ' ' + raw_suggestion_list[idx]
-
-    def _get_command_list_internal(self):
-        """Returns the list of commands from all command handlers along with the
-        handler it came from."""
-        fns = {
-            k: (handler, getattr(v, '__command__'))
-            for handler in self._handlers
-            for k, v in handler.__class__.__dict__.items()
-            if getattr(v, '__command__', None) is not None
-        }
-        return fns
-
-    def _get_autocomplete_handlers(self, obj: Iterable[str]):
-        """Returns a list of autocomplete handlers for the given object type."""
-        fns = [
-            (handler, v)
-            for handler in self._handlers
-            for k, v in handler.__class__.__dict__.items()
-            if getattr(v, '__autocomplete__', None) is not None and
-            getattr(v, '__autocomplete__') in obj
-        ]
-        return fns
+        return ' '.join(cmd[:-1]) + ' ' + index.raw[idx]
+
+    def _get_completion_index(self, obj: Iterable[str], cmd: List[str]) -> CompletionIndex:
+        """Returns the completion index for the given object types, indexes of
+        static autocompletion handlers are kept in the command table.
+
+        :param obj: The object types to autocomplete.
+        :param cmd: The input from the player given as a list."""
+        table = self.table
+        key = tuple(obj)
+        index = table.completions.get(key)
+        if index is not None:
+            return index
+        suggestion_funcs = table.get_autocompleters(key)
+        suggestions: List[str] = []
+        for idx, suggestion_func in suggestion_funcs:
+            handler = self._handlers[idx]
+            base_arguments = self._build_initial_argument_list(suggestion_func)
+            suggestions.extend(
+                suggestion_func(
+                    handler, *(base_arguments + [cmd])))
+        if not all(f.__autocomplete_static__ for _, f in suggestion_funcs):
+            return CompletionIndex(suggestions)
+        index = table.completions[key] = CompletionIndex(suggestions, indexed=True)
+        return index
 
-    def _get_alias_handlers(self):
-        """Returns a list of alias providers."""
-        fns = {
-            alias: cmd
-            for handler in self._handlers
-            for k, v in handler.__class__.__dict__.items()
-            if getattr(v, '__alias__', None)
-            for alias, cmd in v(handler)
-        }
-        return fns
-    
     def get_command(self, command: str):
         """Returns the command data for the given command."""
-        fns = [
-            getattr(v, '__command__')
-            for handler in self._handlers
-            for k, v in handler.__class__.__dict__.items()
-            if getattr(v, '__command__', None) is not None
-        ]
-        fn = next(iter([f for f in fns if f['func'].__name__ == command]), None)
-        return fn
+        return self.table.get_command(command)
 
     def get_command_list(self):
-        """Returns a list of all the commands."""
-        fns = [
-            getattr(v, '__command__')
-            for handler in self._handlers
-            for k, v in handler.__class__.__dict__.items()
-            if getattr(v, '__command__', None) is not None
-        ]
-        fns.sort(key=lambda x: x['func'].__name__)
-        return fns
+        """Returns a list of all the commands sorted by name, the list is
+        shared so must not be modified."""
+        return self.table.command_list
@@ -106,16 +106,16 @@ class BasicCommands:
         else:
             await c.send_message('game', 'Setting not found.')
 
-    @autocomplete('page')
+    @autocomplete('page', static=True)
     def autocomplete_page(self, input: List[str]):
         return []
 
-    @autocomplete('command')
+    @autocomplete('command', static=True)
     def autocomplete_command(self, handler: CommandHandler, input: List[str]):
         """Autocomplete command functions"""
         return [c["func"].__name__ for c in handler.get_command_list()]
     
-    @autocomplete('setting')
+    @autocomplete('setting', static=True)
     def autocomplete_setting(self, input: List[str]):
         return ['input', 'scroll', 'map_on_survey']
     
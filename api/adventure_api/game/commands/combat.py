@@ -20,22 +20,17 @@ class CombatCommands:
         :command_param_type target: target
         :command_param_type ordinal: target_ordinal
         :command_category: Combat"""
+        ordinal_int = 1
         if ordinal is not None:
             try:
-                ordinal_int = int(ordinal) - 1
+                ordinal_int = int(ordinal)
             except ValueError:
                 await c.send_message('game', '@red@Ordinal must be a number.@res@\n')
                 return
-        targets = cell.find(target)
-        if not targets:
+        target = cell.find_one(target, ordinal_int)
+        if target is None:
             await c.send_message('game', '@red@Target could not be found.@res@\n')
             return
-        if ordinal is None:
-            ordinal_int = 0
-        try:
-            target = targets[ordinal_int]
-        except IndexError:
-            await c.send_message('game', '@red@Target could not be found.@res@\n')
         await c.start_attacking(target.id)
 
     @autocomplete('target')
@@ -46,5 +41,4 @@ class CombatCommands:
     @autocomplete('target_ordinal')
     def autocomplete_target_ordinal(self, cell: 'Cell', input: List[str]):
         """Attempts to auto-complete the targets ordinal."""
-        targets = cell.find(input[1])
-        return [str(i + 1) for i in range(len(targets))]
+        return [str(i + 1) for i in range(len(cell.find(input[1])))]
@@ -1,5 +1,6 @@
 from typing import TYPE_CHECKING
 from .base import command
+from ..world import World
 
 if TYPE_CHECKING:
     from ..character import Character
@@ -19,9 +20,9 @@ class IntroCommands:
         if len(name_str) > 12:
             await character.send_message('game', 'Character name must be below 12 characters.\n')
             return
-        character._name = name_str
+        World.rename_player(character, name_str)
         character.set_state('adventure')
-        character.move(0, 0)
+        await character.move(0, 0)
         
         # Send welcome message
         await character.send_message('game', 'Welcome @lgr@{}@res@!\nUse "help" to list commands to get started.\n', name_str)
@@ -31,10 +31,8 @@ class ItemCommands:
         :command_param_type item: inventory
         :command_category: Inventory"""
         if item == 'all':
-            count = len(c.inventory)
-            for i in range(count):
-                c._cell.add_item(0)
-                c.remove_item_at(0)
+            while c._inventory:
+                c._cell.add_item(c.remove_item_at(0))
             
             await c.send_message('game', 'You drop all items in your inventory.\n')
             return
@@ -46,9 +44,7 @@ class ItemCommands:
         if i_idx == -1:
             await c.send_message('game', 'You don\'t have a @yel@{}@res@.\n', item)
             return
-        inv_item = c._inventory[i_idx]
-        c.remove_item_at(i_idx)
-        c._cell.add_item(inv_item)
+        c._cell.add_item(c.remove_item_at(i_idx))
         await c.send_message('game', 'You drop the @yel@{}@res@\n', item)
 
     @command
@@ -8,14 +8,13 @@ from .base import aliases, autocomplete, command, CommandHandler
 from ..enemy import Enemy
 from ..world import World
 from ..item import Item
+from ..terrain import get_biome_icon, get_population_icon
 
 if TYPE_CHECKING:
     from ..cell import Cell
     from ..character import Character
 
 
-IMMOVABLE_BIOMES = ['sea', 'mountain']
-
 SURVEY_MESSAGES = [
     "You take a moment to observe your surroundings.",
     "You scan the area, taking in the details.",
@@ -28,6 +27,24 @@ SURVEY_MESSAGES = [
     "You assess the area, noting anything of importance."
 ]
 
+
+def get_available_directions(x: int, z: int) -> List[str]:
+    """Returns the directions which can be moved to from the given coordinate.
+
+    :param x: The x coordinate.
+    :param z: The z coordinate."""
+    available_directions: List[str] = []
+    if World.is_passable(x - 1, z):
+        available_directions.append('west')
+    if World.is_passable(x + 1, z):
+        available_directions.append('east')
+    if World.is_passable(x, z - 1):
+        available_directions.append('north')
+    if World.is_passable(x, z + 1):
+        available_directions.append('south')
+    return available_directions
+
+
 class WorldCommands:
     """Command handler for commands which interact with the world and areas
     within that world."""
@@ -85,12 +102,13 @@ class WorldCommands:
                 for x in range(9):
                     cx = c._x + x - 4
                     cz = c._z + z - 2
-                    l_cell = World.get_cell(cx, cz)
-                    population_map = population_map + l_cell.population_icon
+                    population_map = population_map + get_population_icon(
+                        World.get_population(cx, cz))
                     if cx == c._x and cz == c._z:
                         biome_map = biome_map + '@lre@@@res@'
                     else:
-                        biome_map = biome_map + l_cell.biome_icon
+                        biome_map = biome_map + get_biome_icon(
+                            World.get_biome(cx, cz))
                 biome_map = biome_map + '\n'
                 population_map = population_map + '\n'
             map_display = ''
@@ -116,7 +134,7 @@ class WorldCommands:
         else:
             await c.send_message('game', 'You look around but there is no @yel@""@res@ in the area\n', ' '.join(args))
             return
-        i_item = c._cell._items.pop(i_idx)
+        i_item = c._cell.remove_item_at(i_idx)
         c.add_item(i_item[0], i_item[1])
         await c.send_message('game', 'You pick up the @yel@{}@res@\n', item)
 
@@ -147,30 +165,24 @@ class WorldCommands:
         :command_summary: Moves the player in the direction specified.
         :command_param_type direction: direction
         :command_category: Movement"""
-        available_directions: List[str] = []
-        if World.get_cell(c._x - 1, c._z)._biome not in IMMOVABLE_BIOMES:
-            available_directions.append('west')
-        if World.get_cell(c._x + 1, c._z)._biome not in IMMOVABLE_BIOMES:
-            available_directions.append('east')
-        if World.get_cell(c._x, c._z - 1)._biome not in IMMOVABLE_BIOMES:
-            available_directions.append('north')
-        if World.get_cell(c._x, c._z + 1)._biome not in IMMOVABLE_BIOMES:
-            available_directions.append('south')
-        if direction not in available_directions:
+        if direction not in get_available_directions(c._x, c._z):
             await c.send_message('game', '@red@You are unable to go in that direction.@res@\n')
             return
-        ox, oz = c._x, c._z
+        x, z = c._x, c._z
         if direction == 'west':
-            c._x = c._x - 1
+            x = x - 1
         elif direction == 'east':
-            c._x = c._x + 1
+            x = x + 1
         elif direction == 'north':
-            c._z = c._z - 1
+            z = z - 1
         elif direction == 'south':
-            c._z = c._z + 1
-        World.unload_cell(ox, oz, c)
-        c._cell = World.load_cell(c._x, c._z, c)
+            z = z + 1
+        await c.move(x, z)
         c._target = None
+        if c._cell is None:
+            # The character has been handed off to the shard which owns the
+            # new cell, it surveys the cell once the character arrives.
+            return
         await self.survey(c, c._cell)
 
     @command
@@ -192,27 +204,26 @@ class WorldCommands:
         :command_category: Interaction"""
         collective = Enemy.get_collective(target)
         if collective is not None:
-            await c.send_message('game', '{}', collective['on_survey'](c, cell._enemies, cell, extended=True))
+            members = cell.find_collective(target)
+            if not members:
+                await c.send_message('game', '@red@Target could not be found.@res@\n')
+                return
+            await c.send_message('game', '{}', collective['on_survey'](c, members, cell, extended=True))
             return
+        ordinal_int = 1
         if ordinal is not None:
             try:
-                ordinal_int = int(ordinal) - 1
+                ordinal_int = int(ordinal)
             except ValueError:
                 await c.send_message('game', '@red@Ordinal must be a number.@res@\n')
                 return
-        targets = cell.find(target)
-        if not targets:
-            await c.send_message('game', '@red@Target could not be found.@res@\n')
-            return
-        if len(targets) > 1 and ordinal is None:
+        elif len(cell.find(target)) > 1:
             await c.send_message('game', '@red@Multiple targets found, please specify which using attack [enemy] [number]@res@\n')
             return
-        if ordinal is None:
-            ordinal_int = 0
-        try:
-            target = targets[ordinal_int]
-        except IndexError:
+        target = cell.find_one(target, ordinal_int)
+        if target is None:
             await c.send_message('game', '@red@Target could not be found.@res@\n')
+            return
         await c.send_message('game', '{} It looks {}.\n', target.description, target.damage_state)
 
     @autocomplete('direction')
@@ -220,16 +231,7 @@ class WorldCommands:
                                input: List[str]) -> List[str]:
         """Autocompletes the direction which the available surrounding cells
         that can be moved to."""
-        available_directions: List[str] = []
-        if World.get_cell(c._x - 1, c._z)._biome not in IMMOVABLE_BIOMES:
-            available_directions.append('west')
-        if World.get_cell(c._x + 1, c._z)._biome not in IMMOVABLE_BIOMES:
-            available_directions.append('east')
-        if World.get_cell(c._x, c._z - 1)._biome not in IMMOVABLE_BIOMES:
-            available_directions.append('north')
-        if World.get_cell(c._x, c._z + 1)._biome not in IMMOVABLE_BIOMES:
-            available_directions.append('south')
-        return available_directions
+        return get_available_directions(c._x, c._z)
     
     @autocomplete('item')
     def autocomplete_item(self, c: 'Character', *inputs: str):
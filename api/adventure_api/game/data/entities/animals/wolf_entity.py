@@ -94,7 +94,11 @@ on_survey = {
     }
 }
 
+# The number of cells away a wolf can be heard howling from.
+HOWL_RADIUS = 3
+
 async def on_wolf_entry(self: Enemy, cell: 'Cell'):
+    await cell.send_message('game', 'You hear the howl of a @red@wolf@res@ nearby.', radius=HOWL_RADIUS)
     choices = []
     choices += on_entry.get(cell._biome, [])
     choices += on_entry['default']
@@ -1,43 +1,145 @@
 import json
+import weakref
+import numpy as np
 from util import generate_id
-from typing import Any, Dict, Optional, TYPE_CHECKING
+from typing import Any, Dict, List, Optional, TYPE_CHECKING
 
 if TYPE_CHECKING:
     from .cell import Cell
     from .character import Character
 
 ENEMY_DATA = {}
+ENEMY_TYPES: List[str] = []
+ENEMY_TYPE_IDS: Dict[str, int] = {}
+
+
+class EnemyStore:
+    """The EnemyStore keeps the state of every enemy as a structure of arrays,
+    an Enemy is a view onto a slot of the store.
+
+    Each tick the attack timers of the engaged enemies, those which are alive
+    and have a target, are counted down together and only the enemies whose
+    attack is due are handled one by one."""
+    _size: int
+    _free: List[int]
+    _hp: np.ndarray
+    _type_id: np.ndarray
+    _timer: np.ndarray
+    _engaged: np.ndarray
+    _targets: np.ndarray
+    _views: List[Optional['weakref.ref[Enemy]']]
+
+    def __init__(self, capacity: int = 256):
+        self._size = 0
+        self._free = []
+        self._hp = np.zeros(capacity, np.int32)
+        self._type_id = np.zeros(capacity, np.int16)
+        self._timer = np.zeros(capacity, np.int32)
+        self._engaged = np.zeros(capacity, np.bool_)
+        self._targets = np.empty(capacity, object)
+        self._views = [None] * capacity
+
+    def allocate(self, enemy: 'Enemy', type_id: int, hp: int) -> int:
+        """Allocates a slot for an enemy, the slot is released once the enemy
+        is garbage collected.
+
+        :param enemy: The enemy the slot is for.
+        :param type_id: The index of the enemy's type in ENEMY_TYPES.
+        :param hp: The hp the enemy starts with."""
+        if self._free:
+            slot = self._free.pop()
+        else:
+            if self._size == len(self._hp):
+                self._grow()
+            slot = self._size
+            self._size += 1
+        self._hp[slot] = hp
+        self._type_id[slot] = type_id
+        self._timer[slot] = 0
+        self._engaged[slot] = False
+        self._targets[slot] = None
+        self._views[slot] = weakref.ref(enemy)
+        return slot
+
+    def release(self, slot: int):
+        """Releases the slot of an enemy which no longer exists.
+
+        :param slot: The slot to release."""
+        self._engaged[slot] = False
+        self._targets[slot] = None
+        self._views[slot] = None
+        self._free.append(slot)
+
+    def _grow(self):
+        capacity = len(self._hp) * 2
+        self._hp = np.resize(self._hp, capacity)
+        self._type_id = np.resize(self._type_id, capacity)
+        self._timer = np.resize(self._timer, capacity)
+        engaged = np.zeros(capacity, np.bool_)
+        engaged[:self._size] = self._engaged[:self._size]
+        self._engaged = engaged
+        targets = np.empty(capacity, object)
+        targets[:self._size] = self._targets[:self._size]
+        self._targets = targets
+        self._views.extend([None] * (capacity - self._size))
+
+    async def tick(self):
+        """Counts down the attack timers of every engaged enemy and lets each
+        enemy whose timer has run out attack."""
+        engaged = self._engaged[:self._size]
+        if not engaged.any():
+            return
+        timer = self._timer[:self._size]
+        timer[engaged] -= 1
+        # Enemies which died since they were engaged drop out here.
+        engaged &= self._hp[:self._size] > 0
+        for slot in np.flatnonzero(engaged & (timer <= 0)):
+            view = self._views[slot]
+            enemy = view() if view is not None else None
+            if enemy is None:
+                self._engaged[slot] = False
+                continue
+            await enemy.attack()
+
+
+ENEMY_STORE = EnemyStore()
+
 
 class Enemy:
     _instance_id: str
-    _internal_name: str
-    _current_hp: int
     _cell: 'Cell'
-    _target: Optional[str]
-    _timer: int
+    _slot: int
     _collectives: Dict[str, Dict[str, Any]] = {}
 
     def __init__(self, cell: 'Cell', internal_name: str):
         self._cell = cell
-        self._internal_name = internal_name
-        self._current_hp = self.data['hp']
         self._instance_id = generate_id(1)
-        self._target = None
-        self._timer = 0
+        self._slot = ENEMY_STORE.allocate(
+            self, ENEMY_TYPE_IDS[internal_name], ENEMY_DATA[internal_name]['hp'])
+        weakref.finalize(self, ENEMY_STORE.release, self._slot)
 
-    async def tick(self):
-        if self._timer > 0:
-            self._timer = self._timer - 1
-            return
-        if self._target is None:
-            return
+    async def attack(self):
+        """Called when the enemy's attack timer has run out, attacks the
+        target and waits for the attack timer before it can attack again."""
         if self.target is None:
             self._target = None
+            self._timer = 0
             return
         is_dead = await self.target.damage(self.id, 1)
         if is_dead:
             self._target = None
-        self._timer = self.data['attack_timer']
+        # The timer is counted down at the start of the next tick, so the
+        # enemy waits for a full attack timer before attacking again.
+        self._timer = self.data['attack_timer'] + 1
+
+    def schedule(self):
+        """Engages the enemy so that it attacks its target, if it has one."""
+        ENEMY_STORE._engaged[self._slot] = self._target is not None and not self.is_dead
+
+    def unschedule(self):
+        """Stops the enemy from attacking."""
+        ENEMY_STORE._engaged[self._slot] = False
+        self._timer = 0
 
     def damage(self, enemy_id: str, damage: int):
         self._current_hp = max(0, self._current_hp - damage)
@@ -45,6 +147,38 @@ class Enemy:
             self._target = enemy_id
         if self.is_dead:
             self._cell.remove(self)
+        else:
+            self.schedule()
+
+    @property
+    def _internal_name(self) -> str:
+        return ENEMY_TYPES[ENEMY_STORE._type_id[self._slot]]
+
+    @property
+    def _current_hp(self) -> int:
+        return int(ENEMY_STORE._hp[self._slot])
+
+    @_current_hp.setter
+    def _current_hp(self, value: int):
+        ENEMY_STORE._hp[self._slot] = value
+
+    @property
+    def _target(self) -> Optional[str]:
+        return ENEMY_STORE._targets[self._slot]
+
+    @_target.setter
+    def _target(self, value: Optional[str]):
+        ENEMY_STORE._targets[self._slot] = value
+        if value is None:
+            ENEMY_STORE._engaged[self._slot] = False
+
+    @property
+    def _timer(self) -> int:
+        return int(ENEMY_STORE._timer[self._slot])
+
+    @_timer.setter
+    def _timer(self, value: int):
+        ENEMY_STORE._timer[self._slot] = value
 
     @property
     def id(self) -> str:
@@ -98,5 +232,8 @@ class Enemy:
 
 
 def register_enemy(data):
+    if data['id'] not in ENEMY_DATA:
+        ENEMY_TYPE_IDS[data['id']] = len(ENEMY_TYPES)
+        ENEMY_TYPES.append(data['id'])
     ENEMY_DATA[data['id']] = data
     Enemy._collectives[data['collective_id']] = ENEMY_DATA[data['id']]
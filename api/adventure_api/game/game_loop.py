@@ -0,0 +1,59 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Callable
+from .cell import load_biomes
+from .data import load_data
+from .sentence import SentenceHandler
+from .terrain import load_terrain_file
+from .tick_clock import TickClock
+from .tick_metrics import TICK_METRICS
+from .world import World
+
+logger = logging.getLogger(__name__)
+
+
+def load_world():
+    """Loads the game data, the baked terrain and the index of saved cells,
+    the database must already be set up."""
+    load_data()
+    load_biomes()
+    SentenceHandler.load_terms()
+    terrain_file = os.environ.get('TERRAIN_FILE', './data/terrain.bin')
+    if os.path.exists(terrain_file):
+        load_terrain_file(terrain_file)
+    World._cell_store.load_index()
+
+
+async def run_game_loop(running: Callable[[], bool]):
+    """Ticks the world on fixed deadlines until it is no longer running, then
+    saves every character and cell.
+
+    :param running: Returns whether the loop should keep running."""
+    logger.info('starting game loop')
+    clock = TickClock()
+    clock.start()
+    while running():
+        try:
+            await asyncio.sleep(clock.until_due())
+            ticks = clock.advance()
+            if ticks:
+                TICK_METRICS.record_clock(clock.lag, clock.skipped, clock.caught_up)
+            if ticks > 1:
+                logger.warning(f'game loop is {clock.lag:.3f}s behind, running {ticks} ticks')
+            for _ in range(ticks):
+                now = time.perf_counter()
+                await World.tick()
+                TICK_METRICS.record_tick(time.perf_counter() - now)
+        except Exception as e:
+            logger.error(f'error occurred in game loop')
+            logger.exception(e)
+    logger.info('saving awaiting characters loop')
+    for c in World._characters:
+        c.save_character()
+    for c in World._awaiting_characters:
+        c.save_character()
+    logger.info('saving cells')
+    World.save_cells()
+    logger.info('ending game loop')
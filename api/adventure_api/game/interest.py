@@ -0,0 +1,59 @@
+import os
+from typing import Dict, List, Tuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .cell import Cell
+
+INTEREST_BUCKET_SIZE = int(os.environ.get('INTEREST_BUCKET_SIZE', 16))
+
+
+class InterestGrid:
+    """A spatial index of the occupied cells, used to find every cell within
+    an area of interest around a coordinate. Cells are bucketed into squares
+    so a search only looks at the buckets which overlap the area, the cost
+    grows with the number of occupied cells nearby rather than in the whole
+    world."""
+    _buckets: Dict[Tuple[int, int], Dict[Tuple[int, int], 'Cell']]
+
+    def __init__(self):
+        self._buckets = {}
+
+    def add(self, cell: 'Cell'):
+        """Adds an occupied cell to the grid.
+
+        :param cell: The cell to add."""
+        bucket = (cell._x // INTEREST_BUCKET_SIZE, cell._z // INTEREST_BUCKET_SIZE)
+        self._buckets.setdefault(bucket, {})[(cell._x, cell._z)] = cell
+
+    def remove(self, cell: 'Cell'):
+        """Removes a cell from the grid.
+
+        :param cell: The cell to remove."""
+        bucket = (cell._x // INTEREST_BUCKET_SIZE, cell._z // INTEREST_BUCKET_SIZE)
+        cells = self._buckets.get(bucket)
+        if cells is None or cells.get((cell._x, cell._z)) is not cell:
+            return
+        del cells[(cell._x, cell._z)]
+        if not cells:
+            del self._buckets[bucket]
+
+    def near(self, x: int, z: int, radius: int) -> List['Cell']:
+        """Gets the occupied cells within a Chebyshev radius of a coordinate,
+        including the cell at the coordinate itself.
+
+        :param x: The x coordinate.
+        :param z: The z coordinate.
+        :param radius: The number of cells in each direction to include."""
+        cells = []
+        for bx in range((x - radius) // INTEREST_BUCKET_SIZE, (x + radius) // INTEREST_BUCKET_SIZE + 1):
+            for bz in range((z - radius) // INTEREST_BUCKET_SIZE, (z + radius) // INTEREST_BUCKET_SIZE + 1):
+                bucket = self._buckets.get((bx, bz))
+                if not bucket:
+                    continue
+                for (cx, cz), cell in bucket.items():
+                    if max(abs(cx - x), abs(cz - z)) <= radius:
+                        cells.append(cell)
+        return cells
+
+
+INTEREST_GRID = InterestGrid()
@@ -0,0 +1,54 @@
+import random
+from typing import Generic, List, Sequence, Tuple, TypeVar
+
+T = TypeVar('T')
+
+
+class AliasSampler(Generic[T]):
+    """Picks from a weighted list of choices in constant time using the alias
+    method. The table is built once from the weights, each sample then only
+    needs a random slot and a single comparison rather than walking the
+    list."""
+    _choices: List[T]
+    _probability: List[float]
+    _alias: List[int]
+
+    def __init__(self, choices: Sequence[Tuple[T, float]]):
+        """Constructs the AliasSampler.
+
+        :param choices: The choices paired with their weights, the weights do
+                        not need to add up to 1."""
+        if not choices:
+            raise ValueError('there must be at least one choice')
+        weights = [float(weight) for _, weight in choices]
+        if any(weight < 0 for weight in weights) or sum(weights) <= 0:
+            raise ValueError('weights must not be negative and not all zero')
+        count = len(choices)
+        total = sum(weights)
+        self._choices = [choice for choice, _ in choices]
+        self._probability = [weight * count / total for weight in weights]
+        self._alias = list(range(count))
+        small = [i for i, p in enumerate(self._probability) if p < 1]
+        large = [i for i, p in enumerate(self._probability) if p >= 1]
+        while small and large:
+            less = small.pop()
+            more = large.pop()
+            self._alias[less] = more
+            self._probability[more] -= 1 - self._probability[less]
+            if self._probability[more] < 1:
+                small.append(more)
+            else:
+                large.append(more)
+        # Whatever is left over is only off from 1 by rounding.
+        for i in small + large:
+            self._probability[i] = 1
+
+    def sample(self) -> T:
+        """Picks a choice at random by its weight."""
+        i = random.randrange(len(self._choices))
+        if random.random() < self._probability[i]:
+            return self._choices[i]
+        return self._choices[self._alias[i]]
+
+    def __len__(self) -> int:
+        return len(self._choices)
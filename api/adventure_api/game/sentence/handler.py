@@ -3,6 +3,7 @@ import importlib
 import pathlib
 import logging
 from typing import TYPE_CHECKING, List, Optional, Tuple
+from util import BKTree
 
 if TYPE_CHECKING:
     from game.character import Character
@@ -66,6 +67,8 @@ class SentenceHandler:
     """The sentence handler parses input from the user and returns with the
     command that should be executed."""
     VERB_BAG: List[Tuple[str, callable]] = []
+    VERB_INDEX: BKTree = BKTree()
+    NOUN_INDEX: BKTree = BKTree()
 
     def __init__(self):
         raise NotImplementedError("This class should not be instantiated.")
@@ -99,13 +102,46 @@ class SentenceHandler:
         verb = words[ctx.idx]
 
         if verb not in [v[0] for v in SentenceHandler.VERB_BAG]:
-            raise UnknownVerbError(f"You sadly don't know how to '{verb}', if you believe this is a mistake please submit a bug report.")
+            corrected = await SentenceHandler.correct(c, SentenceHandler.VERB_INDEX, verb)
+            if corrected is None:
+                raise UnknownVerbError(f"You sadly don't know how to '{verb}', if you believe this is a mistake please submit a bug report.")
+            verb = corrected
         
         for v in SentenceHandler.VERB_BAG:
             if v[0] == verb:
                 ctx.idx += 1
                 return await v[1](c, ctx)
 
+    @staticmethod
+    async def correct(c: 'Character', index: BKTree, word: str) -> Optional[str]:
+        """Corrects a misspelt word to the closest word in the index, the
+        character is told which word was used instead.
+
+        :param c: The character which input the word.
+        :param index: The index of words to correct to.
+        :param word: The word to correct.
+
+        :return: The corrected word, or None if nothing is close enough."""
+        match, _ = index.closest(word)
+        if match is not None and match != word:
+            await c.send_message('game', 'Assuming you meant "@lbl@{}@res@".\n', match)
+        return match
+
+    @staticmethod
+    def build_indexes():
+        """Builds the indexes used to correct misspelt verbs and nouns, from the
+        loaded verbs, enemies and items."""
+        from ..enemy import ENEMY_DATA
+        from ..item import Item
+        SentenceHandler.VERB_INDEX = BKTree(v[0] for v in SentenceHandler.VERB_BAG)
+        nouns = ['around']
+        for data in ENEMY_DATA.values():
+            nouns += [data['name'].lower(), data['collective_id']]
+        for data in Item._item_data.values():
+            if 'noun' in data:
+                nouns.append(data['noun'].lower())
+        SentenceHandler.NOUN_INDEX = BKTree(nouns)
+
     @staticmethod
     def load_terms():
         """Loads all the terms from the verbs directory."""
@@ -117,3 +153,4 @@ class SentenceHandler:
                     path = path.replace('.py', '')
                     logging.info(f'loaded terms from {path}')
                     importlib.import_module(f'{__package__}{path}', package=__package__)
+        SentenceHandler.build_indexes()
@@ -21,7 +21,10 @@ async def want(c: 'Character', ctx: 'SentenceContext'):
             raise InvalidTargetError("You want to want something, what a novel concept.")
         else:
             if verb not in [v[0] for v in SentenceHandler.VERB_BAG]:
-                raise InvalidTargetError(f"Sadly, despite wanting to, you don't know how to '{verb}', if you believe this is a mistake please submit a bug report.")
+                corrected = await SentenceHandler.correct(c, SentenceHandler.VERB_INDEX, verb)
+                if corrected is None:
+                    raise InvalidTargetError(f"Sadly, despite wanting to, you don't know how to '{verb}', if you believe this is a mistake please submit a bug report.")
+                verb = corrected
             
             for v in SentenceHandler.VERB_BAG:
                 if v[0] == verb:
@@ -1,6 +1,6 @@
 from typing import TYPE_CHECKING
 
-from ..handler import SentenceContext, InvalidTargetError, verb
+from ..handler import SentenceContext, InvalidTargetError, SentenceHandler, verb
 
 if TYPE_CHECKING:
     from game.character import Character
@@ -11,8 +11,25 @@ async def look(c: 'Character', ctx: 'SentenceContext'):
     print(target)
     if target is None:
         raise InvalidTargetError("You may want to try looking at something, someone or just 'around'.")
+    if target != 'around' and not _is_present(c, target):
+        target = await SentenceHandler.correct(c, SentenceHandler.NOUN_INDEX, target) or target
     
     if target == 'around':
         await c.command_handler.handle_input(['survey'])
+    else:
+        ordinal = ctx.next_word()
+        await c.command_handler.handle_input(
+            ['look', target] + ([ordinal] if ordinal is not None else []))
     
     return 'look', c, ctx
+
+
+def _is_present(c: 'Character', target: str) -> bool:
+    """Checks whether the target is already something in the character's
+    cell, so it is not corrected into another word."""
+    cell = c._cell
+    if cell is None:
+        return False
+    if cell.find(target) or cell.find_collective(target):
+        return True
+    return any(x.name and x.name.lower() == target for x in cell.characters)
@@ -0,0 +1,330 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import signal
+import threading
+from multiprocessing.connection import Connection
+from multiprocessing.process import BaseProcess
+from typing import Any, Dict, List, Optional, Tuple
+from fastapi import WebSocket, WebSocketDisconnect
+from starlette.websockets import WebSocketState
+from model import get_user_location
+from .character import OUTBOX_SIZE, Character, connect_character, disconnect_character
+from .game_loop import load_world, run_game_loop
+from .world import World
+
+logger = logging.getLogger(__name__)
+
+REGION_SIZE = int(os.environ.get('REGION_SIZE', 64))
+WORLD_SHARDS = int(os.environ.get('WORLD_SHARDS', 1))
+
+
+def region_of(x: int, z: int) -> Tuple[int, int]:
+    """Gets the region a coordinate is within.
+
+    :param x: The x coordinate.
+    :param z: The z coordinate."""
+    return x // REGION_SIZE, z // REGION_SIZE
+
+
+def shard_of(x: int, z: int, count: int) -> int:
+    """Gets the shard which owns the region a coordinate is within.
+
+    :param x: The x coordinate.
+    :param z: The z coordinate.
+    :param count: The number of shards."""
+    rx, rz = region_of(x, z)
+    return ((rx * 73856093) ^ (rz * 19349663)) % count
+
+
+class RemoteSocket:
+    """Stands in for the websocket of a character simulated by a shard, the
+    messages are sent to the router which owns the real websocket."""
+    client_state: WebSocketState
+
+    def __init__(self, shard: 'ShardWorker', id: str):
+        self._shard = shard
+        self._id = id
+        self.client_state = WebSocketState.CONNECTED
+
+    async def send_json(self, data: Dict[str, Any]):
+        self._shard.send(('send', self._id, data))
+
+    async def close(self):
+        self.client_state = WebSocketState.DISCONNECTED
+        self._shard.send(('close', self._id))
+
+
+class ShardWorker:
+    """The ShardWorker runs in a worker process and simulates the regions of
+    the world owned by its shard. It receives the input of the characters
+    within its regions from the router and sends their messages back to it."""
+    _index: int
+    _count: int
+    _conn: Connection
+    _lock: threading.Lock
+    _inbox: 'asyncio.Queue[Tuple]'
+    _sockets: Dict[str, RemoteSocket]
+    _running: bool
+
+    def __init__(self, index: int, count: int, conn: Connection):
+        """Constructs the ShardWorker.
+
+        :param index: The index of this shard.
+        :param count: The number of shards.
+        :param conn: The pipe to the router."""
+        self._index = index
+        self._count = count
+        self._conn = conn
+        self._lock = threading.Lock()
+        self._inbox = asyncio.Queue()
+        self._sockets = {}
+        self._running = True
+
+    def owns(self, x: int, z: int) -> bool:
+        """Checks whether the coordinate is within a region of this shard.
+
+        :param x: The x coordinate.
+        :param z: The z coordinate."""
+        return shard_of(x, z, self._count) == self._index
+
+    def send(self, message: Tuple):
+        """Sends a message to the router.
+
+        :param message: The message to send."""
+        with self._lock:
+            self._conn.send(message)
+
+    def broadcast(self, message: Dict[str, Any]):
+        """Sends a message to every connected player through the router.
+
+        :param message: The message to send."""
+        self.send(('broadcast', message))
+
+    def hand_off(self, character: Character):
+        """Tells the router the character has moved to a region owned by
+        another shard, sending anything the character still has queued first
+        so it reaches the client before the new shard's messages.
+
+        :param character: The character to hand off."""
+        character.stop_writer()
+        while not character._outbox.empty():
+            self.send(('send', character._id, character._outbox.get_nowait()))
+        self._sockets.pop(character._id, None)
+        self.send(('handoff', character._id, character._x, character._z))
+
+    async def run(self):
+        """Runs the game loop and handles messages from the router until the
+        router stops the shard."""
+        loop = asyncio.get_running_loop()
+        threading.Thread(target=self._read, args=(loop,), daemon=True).start()
+        game = asyncio.create_task(run_game_loop(lambda: self._running))
+        while self._running:
+            message = await self._inbox.get()
+            try:
+                await self._handle(message)
+            except Exception as e:
+                logger.error('error occurred handling shard message [%s]', message[0])
+                logger.exception(e)
+        await game
+
+    def _read(self, loop: asyncio.AbstractEventLoop):
+        while True:
+            try:
+                message = self._conn.recv()
+            except (EOFError, OSError):
+                message = ('stop',)
+            loop.call_soon_threadsafe(self._inbox.put_nowait, message)
+            if message[0] == 'stop':
+                return
+
+    async def _handle(self, message: Tuple):
+        kind = message[0]
+        if kind == 'connect':
+            _, id, session_id, handed_off = message
+            ws = RemoteSocket(self, id)
+            self._sockets[id] = ws
+            character = await connect_character(id, ws, session_id, handed_off)
+            if handed_off:
+                await character.command_handler.handle_input(['survey'])
+        elif kind == 'input':
+            _, id, data = message
+            character = World.get_player_by_id(id)
+            if character is None or id not in self._sockets:
+                # The character has been handed off since the router sent
+                # this, so it goes back to be routed to the new shard.
+                self.send(('unrouted', id, data))
+                return
+            await character.handle_client_input(data)
+        elif kind == 'disconnect':
+            _, id = message
+            ws = self._sockets.pop(id, None)
+            character = World.get_player_by_id(id)
+            if ws is not None and character is not None:
+                ws.client_state = WebSocketState.DISCONNECTED
+                disconnect_character(character, ws)
+        elif kind == 'stop':
+            self._running = False
+
+
+def run_shard(index: int, count: int, conn: Connection):
+    """The entry point of a shard worker process.
+
+    :param index: The index of the shard.
+    :param count: The number of shards.
+    :param conn: The pipe to the router."""
+    # The router stops the shard when the server shuts down, so an interrupt
+    # must not kill it before the world is saved.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    logging.basicConfig(level=logging.INFO)
+    load_world()
+    worker = ShardWorker(index, count, conn)
+    World._shard = worker
+    logger.info('starting shard %s of %s', index, count)
+    asyncio.run(worker.run())
+
+
+class RoutedConnection:
+    """A websocket connected to the router, messages from the shards are
+    queued and written in order by a writer task."""
+    ws: WebSocket
+    session_id: str
+    _outbox: 'asyncio.Queue[Dict[str, Any]]'
+    _writer: 'asyncio.Task'
+
+    def __init__(self, ws: WebSocket, session_id: str):
+        self.ws = ws
+        self.session_id = session_id
+        self._outbox = asyncio.Queue(OUTBOX_SIZE)
+        self._writer = asyncio.create_task(self._write_messages())
+
+    def queue(self, message: Dict[str, Any]):
+        try:
+            self._outbox.put_nowait(message)
+        except asyncio.QueueFull:
+            logger.warning('outbox full, dropping message')
+
+    def close(self):
+        self._writer.cancel()
+
+    async def _write_messages(self):
+        while True:
+            message = await self._outbox.get()
+            try:
+                await self.ws.send_json(message)
+            except Exception:
+                return
+
+
+class ShardRouter:
+    """The ShardRouter splits the world into regions simulated by worker
+    processes. It owns every websocket, forwards input to the shard which
+    owns the player's cell and moves players between shards as they cross
+    region boundaries. Broadcasts from any shard are sent to every player."""
+    _count: int
+    _processes: List[BaseProcess]
+    _conns: List[Connection]
+    _owners: Dict[str, int]
+    _connections: Dict[str, RoutedConnection]
+    _loop: Optional[asyncio.AbstractEventLoop]
+
+    def __init__(self, count: int):
+        """Constructs the ShardRouter.
+
+        :param count: The number of shards."""
+        self._count = count
+        self._processes = []
+        self._conns = []
+        self._owners = {}
+        self._connections = {}
+        self._loop = None
+
+    def start(self):
+        """Starts a worker process for each shard, must be called from the
+        server's event loop."""
+        self._loop = asyncio.get_running_loop()
+        context = multiprocessing.get_context('spawn')
+        for index in range(self._count):
+            conn, child_conn = context.Pipe()
+            process = context.Process(
+                target=run_shard, args=(index, self._count, child_conn), daemon=True)
+            process.start()
+            self._processes.append(process)
+            self._conns.append(conn)
+            threading.Thread(target=self._read, args=(index, conn), daemon=True).start()
+
+    async def stop(self):
+        """Stops every shard, waiting for them to save the world."""
+        for conn in self._conns:
+            conn.send(('stop',))
+        for process in self._processes:
+            await self._loop.run_in_executor(None, process.join)
+
+    async def play(self, ws: WebSocket, id: str, session_id: str):
+        """Routes a player's websocket until it disconnects.
+
+        :param ws: The websocket of the player.
+        :param id: The user id.
+        :param session_id: The session of the connection."""
+        existing = self._connections.get(id)
+        if existing is not None:
+            if existing.session_id != session_id:
+                await existing.ws.send_json(dict(type='error', data='You have logged in elsewhere, please refresh to reconnect here.', retry=False))
+            await existing.ws.close()
+        connection = RoutedConnection(ws, session_id)
+        self._connections[id] = connection
+        if id not in self._owners:
+            location = get_user_location(id) or (0, 0)
+            self._owners[id] = shard_of(location[0], location[1], self._count)
+        self._send(self._owners[id], ('connect', id, session_id, False))
+        try:
+            while True:
+                data = await ws.receive_json()
+                self._send(self._owners[id], ('input', id, data))
+        except WebSocketDisconnect:
+            logging.info('websocket [%s] disconnected', id)
+        except Exception as e:
+            logging.exception(e)
+            await ws.close()
+        finally:
+            if self._connections.get(id) is connection:
+                del self._connections[id]
+                self._send(self._owners[id], ('disconnect', id))
+            connection.close()
+
+    def _send(self, index: int, message: Tuple):
+        self._conns[index].send(message)
+
+    def _read(self, index: int, conn: Connection):
+        while True:
+            try:
+                message = conn.recv()
+            except (EOFError, OSError):
+                return
+            self._loop.call_soon_threadsafe(self._dispatch, index, message)
+
+    def _dispatch(self, index: int, message: Tuple):
+        kind = message[0]
+        if kind == 'send':
+            _, id, data = message
+            connection = self._connections.get(id)
+            if connection is not None:
+                connection.queue(data)
+        elif kind == 'broadcast':
+            for connection in self._connections.values():
+                connection.queue(message[1])
+        elif kind == 'close':
+            connection = self._connections.get(message[1])
+            if connection is not None:
+                asyncio.create_task(connection.ws.close())
+        elif kind == 'handoff':
+            _, id, x, z = message
+            self._owners[id] = shard_of(x, z, self._count)
+            connection = self._connections.get(id)
+            if connection is not None:
+                self._send(self._owners[id], ('connect', id, connection.session_id, True))
+        elif kind == 'unrouted':
+            _, id, data = message
+            if id in self._connections and self._owners.get(id, index) != index:
+                self._send(self._owners[id], ('input', id, data))
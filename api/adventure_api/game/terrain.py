@@ -0,0 +1,326 @@
+import logging
+import mmap
+import numpy as np
+import struct
+from functools import lru_cache
+from noise import snoise2
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+HEIGHT_SCALE = 60
+TREE_SCALE = 30
+
+CHUNK_SIZE = 64
+CHUNK_CACHE_SIZE = 256
+
+TERRAIN_FILE_MAGIC = b'NYMT'
+TERRAIN_FILE_VERSION = 1
+# magic, version, x, z, width, depth, height scale, tree scale
+TERRAIN_FILE_HEADER = struct.Struct('<4sHiiIIHH')
+
+BIOMES = ['sea', 'mountain', 'forest', 'plains']
+IMMOVABLE_BIOMES = ['sea', 'mountain']
+
+# The simplex tables and skew factors mirror the ones used by the noise library
+# so the chunked generator produces the exact same values as snoise2.
+_PERM = [
+    151, 160, 137, 91, 90, 15, 131, 13, 201, 95, 96, 53, 194, 233, 7, 225,
+    140, 36, 103, 30, 69, 142, 8, 99, 37, 240, 21, 10, 23, 190, 6, 148, 247,
+    120, 234, 75, 0, 26, 197, 62, 94, 252, 219, 203, 117, 35, 11, 32, 57,
+    177, 33, 88, 237, 149, 56, 87, 174, 20, 125, 136, 171, 168, 68, 175, 74,
+    165, 71, 134, 139, 48, 27, 166, 77, 146, 158, 231, 83, 111, 229, 122,
+    60, 211, 133, 230, 220, 105, 92, 41, 55, 46, 245, 40, 244, 102, 143, 54,
+    65, 25, 63, 161, 1, 216, 80, 73, 209, 76, 132, 187, 208, 89, 18, 169,
+    200, 196, 135, 130, 116, 188, 159, 86, 164, 100, 109, 198, 173, 186, 3,
+    64, 52, 217, 226, 250, 124, 123, 5, 202, 38, 147, 118, 126, 255, 82, 85,
+    212, 207, 206, 59, 227, 47, 16, 58, 17, 182, 189, 28, 42, 223, 183, 170,
+    213, 119, 248, 152, 2, 44, 154, 163, 70, 221, 153, 101, 155, 167, 43,
+    172, 9, 129, 22, 39, 253, 19, 98, 108, 110, 79, 113, 224, 232, 178, 185,
+    112, 104, 218, 246, 97, 228, 251, 34, 242, 193, 238, 210, 144, 12, 191,
+    179, 162, 241, 81, 51, 145, 235, 249, 14, 239, 107, 49, 192, 214, 31,
+    181, 199, 106, 157, 184, 84, 204, 176, 115, 121, 50, 45, 127, 4, 150,
+    254, 138, 236, 205, 93, 222, 114, 67, 29, 24, 72, 243, 141, 128, 195,
+    78, 66, 215, 61, 156, 180
+]
+PERM = np.array(_PERM * 2, dtype=np.int32)
+GRAD_X = np.array([1, -1, 1, -1, 1, -1, 1, -1, 0, 0, 0, 0], dtype=np.float32)
+GRAD_Y = np.array([1, 1, -1, -1, 0, 0, 0, 0, 1, -1, 1, -1], dtype=np.float32)
+F2 = np.float32(0.3660254037844386)
+G2 = np.float32(0.21132486540518713)
+
+
+def generate_biome(x: int, z: int) -> str:
+    """Generates the biome at the given coordinate from the world noise, this
+    is deterministic so the same coordinate always has the same biome.
+
+    This is the per tile reference of generate_biome_grid.
+
+    :param x: The x coordinate.
+    :param z: The z coordinate."""
+    height = snoise2(
+        x / HEIGHT_SCALE,
+        z / HEIGHT_SCALE,
+        octaves=6,
+        lacunarity=2,
+        persistence=0.5) * 100 + 30
+    trees = snoise2(
+        (x + 1000) / TREE_SCALE,
+        (z + 1000) / TREE_SCALE,
+        octaves=4,
+        lacunarity=2,
+        persistence=0.5
+    ) * 100
+    if height < 0:
+        return 'sea'
+    elif height > 60:
+        return 'mountain'
+    if trees > 0:
+        return 'forest'
+    return 'plains'
+
+
+def _simplex2(x: np.ndarray, y: np.ndarray) -> np.ndarray:
+    """Single octave 2D simplex noise over arrays of float32 coordinates, each
+    operation is done in the same order as the noise library to keep the
+    results identical."""
+    s = (x + y) * F2
+    i = np.floor(x + s)
+    j = np.floor(y + s)
+    t = (i + j) * G2
+
+    x0 = x - (i - t)
+    y0 = y - (j - t)
+    i1 = x0 > y0
+    j1 = ~i1
+
+    x1 = x0 - i1.astype(np.float32) + G2
+    y1 = y0 - j1.astype(np.float32) + G2
+    x2 = x0 + G2 * np.float32(2) - np.float32(1)
+    y2 = y0 + G2 * np.float32(2) - np.float32(1)
+
+    ii = i.astype(np.int32) & 255
+    jj = j.astype(np.int32) & 255
+    g0 = PERM[ii + PERM[jj]] % 12
+    g1 = PERM[ii + i1 + PERM[jj + j1]] % 12
+    g2 = PERM[ii + 1 + PERM[jj + 1]] % 12
+
+    total = np.zeros_like(x)
+    for xx, yy, g in ((x0, y0, g0), (x1, y1, g1), (x2, y2, g2)):
+        f = np.maximum(np.float32(0.5) - xx * xx - yy * yy, np.float32(0))
+        total += f * f * f * f * (GRAD_X[g] * xx + GRAD_Y[g] * yy)
+    return total * np.float32(70)
+
+
+def _fbm2(x: np.ndarray, y: np.ndarray, octaves: int, persistence: float,
+          lacunarity: float) -> np.ndarray:
+    """Fractal simplex noise over arrays, equivalent to calling snoise2 for
+    each coordinate with the same octaves, persistence and lacunarity."""
+    x = x.astype(np.float32)
+    y = y.astype(np.float32)
+    freq = np.float32(1)
+    amp = np.float32(1)
+    total_amp = np.float32(1)
+    total = _simplex2(x, y)
+    for _ in range(1, octaves):
+        freq = freq * np.float32(lacunarity)
+        amp = amp * np.float32(persistence)
+        total_amp = total_amp + amp
+        total = total + _simplex2(x * freq, y * freq) * amp
+    return total / total_amp
+
+
+def generate_biome_grid(x: int, z: int, width: int, depth: int) -> np.ndarray:
+    """Generates the biomes for a whole region in one pass, the result is an
+    array of indexes into BIOMES where grid[dz, dx] is the biome at
+    (x + dx, z + dz).
+
+    :param x: The x coordinate of the top left of the region.
+    :param z: The z coordinate of the top left of the region.
+    :param width: The number of tiles along the x axis.
+    :param depth: The number of tiles along the z axis."""
+    zs, xs = np.mgrid[z:z + depth, x:x + width].astype(np.float64)
+    height = _fbm2(
+        xs / HEIGHT_SCALE,
+        zs / HEIGHT_SCALE,
+        octaves=6,
+        lacunarity=2,
+        persistence=0.5).astype(np.float64) * 100 + 30
+    trees = _fbm2(
+        (xs + 1000) / TREE_SCALE,
+        (zs + 1000) / TREE_SCALE,
+        octaves=4,
+        lacunarity=2,
+        persistence=0.5).astype(np.float64) * 100
+    grid = np.where(trees > 0, BIOMES.index('forest'), BIOMES.index('plains'))
+    grid = np.where(height > 60, BIOMES.index('mountain'), grid)
+    grid = np.where(height < 0, BIOMES.index('sea'), grid)
+    return grid.astype(np.uint8)
+
+
+@lru_cache(maxsize=CHUNK_CACHE_SIZE)
+def get_chunk(cx: int, cz: int) -> np.ndarray:
+    """Gets the biome grid of the chunk at the given chunk coordinate,
+    recently used chunks are cached so neighbouring lookups don't generate
+    noise again.
+
+    :param cx: The chunk x coordinate.
+    :param cz: The chunk z coordinate."""
+    chunk = generate_biome_grid(
+        cx * CHUNK_SIZE, cz * CHUNK_SIZE, CHUNK_SIZE, CHUNK_SIZE)
+    chunk.setflags(write=False)
+    return chunk
+
+
+class TerrainFile:
+    """A baked terrain file which holds one byte per tile for a bounded region
+    of the world, the file is memory mapped so every process reading it shares
+    the same pages."""
+    _x: int
+    _z: int
+    _width: int
+    _depth: int
+    _file: Optional[mmap.mmap]
+
+    def __init__(self, path: str):
+        """Opens and validates the terrain file at the given path.
+
+        :param path: The path of the baked terrain file."""
+        with open(path, 'rb') as f:
+            self._file = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._file) < TERRAIN_FILE_HEADER.size:
+            self.close()
+            raise ValueError(f'terrain file {path} is too small')
+        (magic, version, self._x, self._z, self._width, self._depth,
+         height_scale, tree_scale) = TERRAIN_FILE_HEADER.unpack_from(self._file)
+        if magic != TERRAIN_FILE_MAGIC or version != TERRAIN_FILE_VERSION:
+            self.close()
+            raise ValueError(f'{path} is not a supported terrain file')
+        if (height_scale, tree_scale) != (HEIGHT_SCALE, TREE_SCALE):
+            self.close()
+            raise ValueError(
+                f'terrain file {path} was baked with different generation parameters')
+        if len(self._file) != TERRAIN_FILE_HEADER.size + self._width * self._depth:
+            self.close()
+            raise ValueError(f'terrain file {path} is truncated')
+
+    def contains(self, x: int, z: int) -> bool:
+        """Checks whether the coordinate is within the baked bounds.
+
+        :param x: The x coordinate.
+        :param z: The z coordinate."""
+        return (self._x <= x < self._x + self._width and
+                self._z <= z < self._z + self._depth)
+
+    def get_biome(self, x: int, z: int) -> str:
+        """Gets the baked biome at the given coordinate, the coordinate must
+        be within the baked bounds.
+
+        :param x: The x coordinate.
+        :param z: The z coordinate."""
+        offset = (z - self._z) * self._width + (x - self._x)
+        return BIOMES[self._file[TERRAIN_FILE_HEADER.size + offset]]
+
+    def close(self):
+        """Closes the memory map."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    @property
+    def bounds(self):
+        return self._x, self._z, self._width, self._depth
+
+
+_terrain_file: Optional[TerrainFile] = None
+
+
+def bake_terrain(path: str, x: int, z: int, width: int, depth: int):
+    """Bakes the biomes of a bounded region of the world into a terrain file
+    which can be loaded with load_terrain_file.
+
+    :param path: The path to write the terrain file to.
+    :param x: The x coordinate of the top left of the region.
+    :param z: The z coordinate of the top left of the region.
+    :param width: The number of tiles along the x axis.
+    :param depth: The number of tiles along the z axis."""
+    with open(path, 'wb') as f:
+        f.write(TERRAIN_FILE_HEADER.pack(
+            TERRAIN_FILE_MAGIC, TERRAIN_FILE_VERSION, x, z, width, depth,
+            HEIGHT_SCALE, TREE_SCALE))
+        # Rows are generated a chunk at a time to keep memory bounded.
+        for row in range(0, depth, CHUNK_SIZE):
+            rows = min(CHUNK_SIZE, depth - row)
+            f.write(generate_biome_grid(x, z + row, width, rows).tobytes())
+
+
+def load_terrain_file(path: str):
+    """Loads a baked terrain file, biomes within its bounds are read from the
+    file and everything outside falls back to generating the noise.
+
+    :param path: The path of the baked terrain file."""
+    global _terrain_file
+    terrain_file = TerrainFile(path)
+    if _terrain_file is not None:
+        _terrain_file.close()
+    _terrain_file = terrain_file
+    logger.info('loaded terrain file %s with bounds %s', path, terrain_file.bounds)
+
+
+def get_biome(x: int, z: int) -> str:
+    """Gets the biome at the given coordinate from the baked terrain file if
+    it covers the coordinate, otherwise from the cached chunk which contains
+    it.
+
+    :param x: The x coordinate.
+    :param z: The z coordinate."""
+    if _terrain_file is not None and _terrain_file.contains(x, z):
+        return _terrain_file.get_biome(x, z)
+    chunk = get_chunk(x // CHUNK_SIZE, z // CHUNK_SIZE)
+    return BIOMES[chunk[z % CHUNK_SIZE, x % CHUNK_SIZE]]
+
+
+def get_biome_icon(biome: str) -> str:
+    """Gets the map icon for the given biome.
+
+    :param biome: The biome."""
+    if biome == 'forest':
+        return '\x1b[32m"\uFE0E\x1b[0m'
+    elif biome == 'mountain':
+        return '\x1b[90m^\x1b[0m'
+    elif biome == 'plains':
+        return '\x1b[32m.\x1b[0m'
+    return '\x1b[34m~\x1b[0m'
+
+
+def get_population_icon(population: int) -> str:
+    """Gets the map icon for the number of characters within a cell.
+
+    :param population: The number of characters."""
+    if population >= 20:
+        return '█'
+    elif population >= 10:
+        return '▓'
+    elif population >= 5:
+        return '▒'
+    elif population >= 1:
+        return '░'
+    return '.'
+
+
+if __name__ == '__main__':
+    import timeit
+
+    size = CHUNK_SIZE
+    per_tile = timeit.timeit(
+        lambda: [generate_biome(x, z) for z in range(size) for x in range(size)],
+        number=5) / 5
+    chunked = timeit.timeit(
+        lambda: generate_biome_grid(0, 0, size, size), number=5) / 5
+    grid = generate_biome_grid(0, 0, size, size)
+    matches = all(
+        BIOMES[grid[z, x]] == generate_biome(x, z)
+        for z in range(size) for x in range(size))
+    print(f'per tile: {per_tile * 1000:.2f}ms per {size}x{size} chunk')
+    print(f'chunked:  {chunked * 1000:.2f}ms per {size}x{size} chunk')
+    print(f'speedup:  {per_tile / chunked:.1f}x, matches: {matches}')
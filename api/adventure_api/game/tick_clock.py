@@ -0,0 +1,56 @@
+import os
+import time
+from typing import Optional
+
+TICK_INTERVAL = 0.6
+MAX_CATCH_UP_TICKS = int(os.environ.get('MAX_CATCH_UP_TICKS', 5))
+
+
+class TickClock:
+    """A fixed-timestep clock which keeps ticks on absolute deadlines, so a
+    slow tick shortens the wait for the next one rather than pushing every
+    later tick back.
+
+    When the loop falls behind by several ticks, a bounded number of make-up
+    ticks are run back to back and the rest are skipped and counted."""
+    _interval: float
+    _max_catch_up: int
+    _deadline: Optional[float]
+    lag: float
+    skipped: int
+    caught_up: int
+
+    def __init__(self, interval: float = TICK_INTERVAL,
+                 max_catch_up: int = MAX_CATCH_UP_TICKS):
+        """Constructs the TickClock.
+
+        :param interval: The number of seconds between ticks.
+        :param max_catch_up: The most ticks to run at once when behind."""
+        self._interval = interval
+        self._max_catch_up = max(1, max_catch_up)
+        self._deadline = None
+        self.lag = 0.0
+        self.skipped = 0
+        self.caught_up = 0
+
+    def start(self):
+        """Starts the clock, the first tick is due straight away."""
+        self._deadline = time.monotonic()
+
+    def until_due(self) -> float:
+        """Returns the number of seconds until the next tick is due."""
+        return max(0.0, self._deadline - time.monotonic())
+
+    def advance(self) -> int:
+        """Moves the clock past every deadline which has passed and returns
+        the number of ticks to run for them."""
+        now = time.monotonic()
+        if now < self._deadline:
+            return 0
+        self.lag = now - self._deadline
+        due = int(self.lag // self._interval) + 1
+        ticks = min(due, self._max_catch_up)
+        self.caught_up += ticks - 1
+        self.skipped += due - ticks
+        self._deadline += due * self._interval
+        return ticks
@@ -0,0 +1,158 @@
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Deque, Dict, Tuple
+
+TICK_BUDGET = 0.6
+HISTOGRAM_SIZE = 500
+CELL_WINDOW_TICKS = 100
+TOP_CELLS = 20
+
+
+class RollingHistogram:
+    """Keeps the most recent samples of a timing so percentiles can be reported
+    over a rolling window, the maximum is kept over all samples."""
+    _samples: Deque[float]
+    count: int
+    max: float
+
+    def __init__(self, size: int = HISTOGRAM_SIZE):
+        self._samples = deque(maxlen=size)
+        self.count = 0
+        self.max = 0.0
+
+    def add(self, value: float):
+        """Adds a sample.
+
+        :param value: The sample in seconds."""
+        self._samples.append(value)
+        self.count += 1
+        if value > self.max:
+            self.max = value
+
+    def summary(self) -> Dict[str, float]:
+        """Returns the count, percentiles and maximum in milliseconds."""
+        samples = sorted(list(self._samples))
+        if not samples:
+            return dict(count=0, p50=0.0, p95=0.0, p99=0.0, max=0.0)
+
+        def percentile(p: float) -> float:
+            return round(samples[min(len(samples) - 1, int(p * len(samples)))] * 1000, 3)
+
+        return dict(
+            count=self.count,
+            p50=percentile(0.5),
+            p95=percentile(0.95),
+            p99=percentile(0.99),
+            max=round(self.max * 1000, 3))
+
+
+class TickMetrics:
+    """Collects how long each tick takes, split by the phases of the tick, the
+    types of entity woken and the cells they are in."""
+    _ticks: RollingHistogram
+    _phases: Dict[str, RollingHistogram]
+    _entity_types: Dict[str, Tuple[float, int]]
+    _cells: Dict[Tuple[int, int], Tuple[float, int]]
+    _last_cells: Dict[Tuple[int, int], Tuple[float, int]]
+    _window_ticks: int
+    _lag: RollingHistogram
+    overruns: int
+    skipped: int
+    caught_up: int
+
+    def __init__(self):
+        self._ticks = RollingHistogram()
+        self._phases = {}
+        self._entity_types = {}
+        self._cells = {}
+        self._last_cells = {}
+        self._window_ticks = 0
+        self._lag = RollingHistogram()
+        self.overruns = 0
+        self.skipped = 0
+        self.caught_up = 0
+
+    def record_tick(self, elapsed: float):
+        """Records the total time of a tick, counting it as an overrun if it
+        took longer than the tick budget.
+
+        :param elapsed: The time the tick took in seconds."""
+        self._ticks.add(elapsed)
+        if elapsed > TICK_BUDGET:
+            self.overruns += 1
+        self._window_ticks += 1
+        if self._window_ticks >= CELL_WINDOW_TICKS:
+            self._window_ticks = 0
+            self._last_cells, self._cells = self._cells, {}
+
+    def record_clock(self, lag: float, skipped: int, caught_up: int):
+        """Records how far behind its deadlines the game loop is.
+
+        :param lag: The seconds between the tick deadline and it starting.
+        :param skipped: The total number of ticks skipped.
+        :param caught_up: The total number of make-up ticks run."""
+        self._lag.add(lag)
+        self.skipped = skipped
+        self.caught_up = caught_up
+
+    @contextmanager
+    def phase(self, name: str):
+        """Times a phase of the tick.
+
+        :param name: The name of the phase."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            if name not in self._phases:
+                self._phases[name] = RollingHistogram()
+            self._phases[name].add(time.perf_counter() - start)
+
+    def record_timer(self, callback: Callable, elapsed: float):
+        """Records the time a timer wheel callback took against the type of
+        entity it belongs to and the cell the entity is in.
+
+        :param callback: The callback which was called.
+        :param elapsed: The time the callback took in seconds."""
+        callback = getattr(callback, 'func', callback)
+        owner = getattr(callback, '__self__', None)
+        if owner is None:
+            entity_type = 'Unknown'
+        elif isinstance(owner, type):
+            entity_type = owner.__name__
+        else:
+            entity_type = owner.__class__.__name__
+        total, count = self._entity_types.get(entity_type, (0.0, 0))
+        self._entity_types[entity_type] = (total + elapsed, count + 1)
+        if owner is None or isinstance(owner, type):
+            return
+        cell = owner if hasattr(owner, '_characters') else getattr(owner, '_cell', None)
+        if cell is None:
+            return
+        coordinate = (cell._x, cell._z)
+        total, count = self._cells.get(coordinate, (0.0, 0))
+        self._cells[coordinate] = (total + elapsed, count + 1)
+
+    def summary(self) -> Dict[str, Any]:
+        """Returns the collected metrics, cells are reported for the last full
+        window of ticks."""
+        cells = sorted(
+            list(self._last_cells.items()), key=lambda c: c[1][0], reverse=True)
+        return dict(
+            budget_ms=TICK_BUDGET * 1000,
+            overruns=self.overruns,
+            skipped=self.skipped,
+            caught_up=self.caught_up,
+            tick=self._ticks.summary(),
+            lag=self._lag.summary(),
+            phases={k: v.summary() for k, v in list(self._phases.items())},
+            entity_types={
+                k: dict(total_ms=round(total * 1000, 3), count=count)
+                for k, (total, count) in list(self._entity_types.items())},
+            cells=[
+                dict(x=x, z=z, total_ms=round(total * 1000, 3), count=count)
+                for (x, z), (total, count) in cells[:TOP_CELLS]])
+
+
+TICK_METRICS = TickMetrics()
@@ -0,0 +1,142 @@
+import logging
+import time
+from typing import Awaitable, Callable, List, Optional
+from .tick_clock import TICK_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+WHEEL_BITS = 6
+WHEEL_SIZE = 1 << WHEEL_BITS
+WHEEL_MASK = WHEEL_SIZE - 1
+WHEEL_LEVELS = 3
+
+
+class Timer:
+    """A callback which is due on a given tick of a TimerWheel."""
+    __slots__ = ('due', 'callback', 'cancelled')
+
+    def __init__(self, due: int, callback: Callable[[], Awaitable[None]]):
+        self.due = due
+        self.callback = callback
+        self.cancelled = False
+
+    def cancel(self):
+        """Cancels the timer, it will be skipped when it becomes due."""
+        self.cancelled = True
+
+
+class TimerWheel:
+    """A hierarchical timer wheel which wakes entities on the tick they are
+    due rather than ticking every entity every tick.
+
+    Each level has 64 slots, a slot on the first level covers a single tick, a
+    slot on the second level 64 ticks and so on. Timers further out than the
+    last level wait in an overflow list. As the wheel turns the timers of a
+    higher level slot cascade down, so each tick only touches the timers which
+    are due on it."""
+    _tick: int
+    _epoch: int
+    _levels: List[List[List[Timer]]]
+    _overflow: List[Timer]
+    _turning: bool
+    observer: Optional[Callable[[Callable, float], None]]
+
+    def __init__(self):
+        self._tick = 0
+        self._epoch = int(time.time() / TICK_INTERVAL)
+        self._levels = [
+            [[] for _ in range(WHEEL_SIZE)] for _ in range(WHEEL_LEVELS)]
+        self._overflow = []
+        self._turning = False
+        self.observer = None
+
+    def schedule(self, delay: int,
+                 callback: Callable[[], Awaitable[None]]) -> Timer:
+        """Schedules a callback to be called in the given number of ticks. A
+        delay of 0 calls it later in the current tick if the wheel is turning,
+        otherwise on the next tick.
+
+        :param delay: The number of ticks to wait.
+        :param callback: The coroutine function to call."""
+        if delay < 1 and not self._turning:
+            delay = 1
+        timer = Timer(self._tick + max(delay, 0), callback)
+        self._insert(timer)
+        return timer
+
+    def remaining(self, timer: Timer) -> int:
+        """Returns the number of ticks until the timer is due.
+
+        :param timer: The timer."""
+        return max(0, timer.due - self._tick)
+
+    def _insert(self, timer: Timer):
+        delta = timer.due - self._tick
+        for level in range(WHEEL_LEVELS):
+            if delta < 1 << (WHEEL_BITS * (level + 1)):
+                slot = (timer.due >> (WHEEL_BITS * level)) & WHEEL_MASK
+                self._levels[level][slot].append(timer)
+                return
+        self._overflow.append(timer)
+
+    def _cascade(self, level: int):
+        slot = (self._tick >> (WHEEL_BITS * level)) & WHEEL_MASK
+        timers = self._levels[level][slot]
+        self._levels[level][slot] = []
+        for timer in timers:
+            if not timer.cancelled:
+                self._insert(timer)
+
+    async def turn(self):
+        """Advances the wheel by a tick and calls every timer which is due."""
+        self._tick += 1
+        if self._tick & ((1 << (WHEEL_BITS * WHEEL_LEVELS)) - 1) == 0:
+            overflow, self._overflow = self._overflow, []
+            for timer in overflow:
+                if not timer.cancelled:
+                    self._insert(timer)
+        for level in range(WHEEL_LEVELS - 1, 0, -1):
+            if self._tick & ((1 << (WHEEL_BITS * level)) - 1) == 0:
+                self._cascade(level)
+        slot = self._levels[0][self._tick & WHEEL_MASK]
+        self._turning = True
+        try:
+            # Timers scheduled with no delay are appended to this slot while
+            # it is being walked, so the length is checked each time.
+            i = 0
+            while i < len(slot):
+                timer = slot[i]
+                i += 1
+                if timer.cancelled:
+                    continue
+                start = time.perf_counter()
+                try:
+                    await timer.callback()
+                except Exception as e:
+                    logger.error('error occurred in timer callback')
+                    logger.exception(e)
+                if self.observer:
+                    self.observer(
+                        timer.callback, time.perf_counter() - start)
+        finally:
+            self._turning = False
+            self._levels[0][self._tick & WHEEL_MASK] = []
+
+    def __len__(self) -> int:
+        return sum(
+            len([t for t in slot if not t.cancelled])
+            for level in self._levels for slot in level) + len(
+            [t for t in self._overflow if not t.cancelled])
+
+    @property
+    def tick(self) -> int:
+        return self._tick
+
+    @property
+    def world_tick(self) -> int:
+        """The tick of the world, counted from when the wheel was created in
+        ticks since the unix epoch so that it carries on across restarts."""
+        return self._epoch + self._tick
+
+
+TIMER_WHEEL = TimerWheel()
@@ -1,82 +1,392 @@
 import asyncio
 import logging
-from datetime import datetime
-from typing import Any, ClassVar, List, Tuple, TYPE_CHECKING
+import os
+import time
+from collections import OrderedDict
+from functools import partial
+from typing import Any, ClassVar, Dict, Iterator, List, Optional, Tuple, TYPE_CHECKING
 from .cell import Cell
+from .cell_store import CellStore
+from .colors import replace_colors
+from .enemy import ENEMY_STORE
+from .interest import INTEREST_GRID
+from .tick_metrics import TICK_METRICS
+from .timer_wheel import TIMER_WHEEL, Timer
+from . import terrain
 
 if TYPE_CHECKING:
     from .character import Character
+    from .shard import ShardWorker
 
 logger = logging.getLogger(__name__)
 
+HIBERNATE_CELL_BUDGET = int(os.environ.get('HIBERNATE_CELL_BUDGET', 512))
+HIBERNATE_SECONDS = int(os.environ.get('HIBERNATE_SECONDS', 300))
+# Disconnected characters are kept for 300 seconds of 600ms ticks.
+AWAITING_TICKS = int(os.environ.get('AWAITING_TICKS', 500))
+
+
+class CellRegistry:
+    """The CellRegistry holds the loaded cells keyed by their coordinate so
+    that a cell can be found, added or removed without scanning every loaded
+    cell. Cells are iterated in the order they were loaded, loaded cells are
+    also kept in the interest grid so areas around a cell can be searched."""
+    _cells: Dict[Tuple[int, int], Cell]
+
+    def __init__(self):
+        self._cells = {}
+
+    def get(self, x: int, z: int) -> Optional[Cell]:
+        """Gets the loaded cell at the given coordinate.
+
+        :param x: The x coordinate of the cell.
+        :param z: The z coordinate of the cell."""
+        return self._cells.get((x, z))
+
+    def add(self, cell: Cell):
+        """Adds a cell to the registry, replacing any cell already loaded at
+        the same coordinate.
+
+        :param cell: The cell to add."""
+        existing = self._cells.get((cell._x, cell._z))
+        if existing is not None:
+            INTEREST_GRID.remove(existing)
+        self._cells[(cell._x, cell._z)] = cell
+        INTEREST_GRID.add(cell)
+
+    def remove(self, cell: Cell):
+        """Removes a cell from the registry.
+
+        :param cell: The cell to remove."""
+        if self._cells.get((cell._x, cell._z)) is cell:
+            del self._cells[(cell._x, cell._z)]
+            INTEREST_GRID.remove(cell)
+
+    def __contains__(self, coordinate: Tuple[int, int]) -> bool:
+        return coordinate in self._cells
+
+    def __len__(self) -> int:
+        return len(self._cells)
+
+    def __iter__(self) -> Iterator[Cell]:
+        # A snapshot is used as cells can be loaded or unloaded while ticking.
+        return iter(list(self._cells.values()))
+
+
+class PlayerRegistry:
+    """The PlayerRegistry holds characters indexed by their user id and their
+    lower-cased name, so that a player can be found without scanning every
+    character. Characters are iterated in the order they were added."""
+    _by_id: Dict[str, 'Character']
+    _by_name: Dict[str, 'Character']
+
+    def __init__(self):
+        self._by_id = {}
+        self._by_name = {}
+
+    def get(self, id: str) -> Optional['Character']:
+        """Gets a character by their user id.
+
+        :param id: The id of the user."""
+        return self._by_id.get(id)
+
+    def get_by_name(self, name: str) -> Optional['Character']:
+        """Gets a character by their name, ignoring case.
+
+        :param name: The name of the character."""
+        return self._by_name.get(name.lower())
+
+    def add(self, character: 'Character'):
+        """Adds a character to the registry, replacing any character with the
+        same user id.
+
+        :param character: The character to add."""
+        existing = self._by_id.get(character._id)
+        if existing is not None and existing is not character:
+            self.remove(existing)
+        self._by_id[character._id] = character
+        if character._name:
+            self._by_name[character._name.lower()] = character
+
+    def remove(self, character: 'Character'):
+        """Removes a character from the registry.
+
+        :param character: The character to remove."""
+        if self._by_id.get(character._id) is not character:
+            return
+        del self._by_id[character._id]
+        if character._name and self._by_name.get(character._name.lower()) is character:
+            del self._by_name[character._name.lower()]
+
+    def rename(self, character: 'Character', name: str):
+        """Changes the name a character is indexed by, the character must be
+        renamed through this while it is in the registry.
+
+        :param character: The character to rename.
+        :param name: The new name of the character."""
+        if self._by_id.get(character._id) is not character:
+            return
+        if character._name and self._by_name.get(character._name.lower()) is character:
+            del self._by_name[character._name.lower()]
+        self._by_name[name.lower()] = character
+
+    def __contains__(self, character: 'Character') -> bool:
+        return self._by_id.get(character._id) is character
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+    def __iter__(self) -> Iterator['Character']:
+        # A snapshot is used as players can join or leave while iterating.
+        return iter(list(self._by_id.values()))
+
+
+class HibernatingCellCache:
+    """The HibernatingCellCache keeps cells which have recently been vacated so
+    that a character returning to them gets the same cell back rather than a
+    freshly generated one. Cells are evicted once they have hibernated for too
+    long or when the cache is over its cell budget, least recently vacated
+    first."""
+    _cells: 'OrderedDict[Tuple[int, int], Tuple[Cell, float]]'
+    _budget: int
+    _max_age: float
+    hits: int
+    misses: int
+    evictions: int
+
+    def __init__(self, budget: int, max_age: float):
+        """Constructs the HibernatingCellCache.
+
+        :param budget: The maximum number of cells to keep.
+        :param max_age: The number of seconds a cell is kept for."""
+        self._cells = OrderedDict()
+        self._budget = budget
+        self._max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def put(self, cell: Cell):
+        """Hibernates a cell which has just been vacated.
+
+        :param cell: The cell to hibernate."""
+        if self._budget <= 0:
+            return
+        cell.hibernate()
+        coordinate = (cell._x, cell._z)
+        self._cells.pop(coordinate, None)
+        self._cells[coordinate] = (cell, time.monotonic())
+        while len(self._cells) > self._budget:
+            self._evict()
+
+    def take(self, x: int, z: int) -> Optional[Cell]:
+        """Revives a hibernating cell, removing it from the cache.
+
+        :param x: The x coordinate of the cell.
+        :param z: The z coordinate of the cell."""
+        entry = self._cells.pop((x, z), None)
+        if entry is None or time.monotonic() - entry[1] > self._max_age:
+            self.misses += 1
+            if entry is not None:
+                self.evictions += 1
+            return None
+        self.hits += 1
+        return entry[0]
+
+    def expire(self):
+        """Evicts every cell which has been hibernating for too long."""
+        now = time.monotonic()
+        while self._cells:
+            _, hibernated_at = next(iter(self._cells.values()))
+            if now - hibernated_at <= self._max_age:
+                break
+            self._evict()
+
+    def _evict(self):
+        (x, z), _ = self._cells.popitem(last=False)
+        self.evictions += 1
+        logger.debug('evicted hibernating cell %s, %s', x, z)
+
+    def __contains__(self, coordinate: Tuple[int, int]) -> bool:
+        return coordinate in self._cells
+
+    def __len__(self) -> int:
+        return len(self._cells)
+
+    def __iter__(self) -> Iterator[Cell]:
+        return iter([cell for cell, _ in self._cells.values()])
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        return dict(
+            size=len(self._cells),
+            budget=self._budget,
+            hits=self.hits,
+            misses=self.misses,
+            evictions=self.evictions)
+
 
 class World:
     """The World is an instance which contains all the players currently
     connected to this world."""
-    _characters: ClassVar[List['Character']]
-    _awaiting_characters: ClassVar[List[Tuple['Character', datetime]]]
-    _loaded_cells: ClassVar[List[Cell]]
+    _characters: ClassVar[PlayerRegistry]
+    _awaiting_characters: ClassVar[PlayerRegistry]
+    _awaiting_timers: ClassVar[Dict[str, Timer]]
+    _loaded_cells: ClassVar[CellRegistry]
+    _hibernating_cells: ClassVar[HibernatingCellCache]
+    _cell_store: ClassVar[CellStore]
+    _shard: ClassVar[Optional['ShardWorker']]
 
     @classmethod
     async def tick(cls):
         """Called each tick (600ms), applies different functions which could be
-        useful in the game world."""
-        for cell in cls._loaded_cells:
-            await cell.tick()
-        for character in cls._awaiting_characters:
-            if (datetime.now() - character[1]).total_seconds() > 300:
-                cls._awaiting_characters.remove(character)
-                if character[0]._cell:
-                    cls.unload_cell(character[0]._x, character[0]._z, character[0])
-                character[0].save_character()
+        useful in the game world. Characters and cells are woken by the timer
+        wheel only on the ticks they are due, as are disconnected characters
+        whose time to reconnect has run out. Enemies are ticked together by
+        the enemy store."""
+        with TICK_METRICS.phase('timers'):
+            await TIMER_WHEEL.turn()
+        with TICK_METRICS.phase('enemies'):
+            await ENEMY_STORE.tick()
+        with TICK_METRICS.phase('hibernation'):
+            cls._hibernating_cells.expire()
+        with TICK_METRICS.phase('saves'):
+            cls._cell_store.tick()
+
+    @classmethod
+    def current_tick(cls) -> int:
+        """Gets the number of ticks simulated since the server started, timers
+        should be based on this rather than the wall clock."""
+        return TIMER_WHEEL.tick
+
+    @classmethod
+    async def fetch_cell(cls, x: int, z: int):
+        """Reads the saved state of a cell which isn't loaded or hibernating
+        without blocking the game loop, so that loading it afterwards doesn't
+        wait on the database.
+
+        :param x: The x coordinate of the cell.
+        :param z: The z coordinate of the cell."""
+        if (x, z) in cls._loaded_cells or (x, z) in cls._hibernating_cells:
+            return
+        await cls._cell_store.fetch(x, z)
 
     @classmethod
     def load_cell(cls, x: int, z: int, character: 'Character'):
         """Loads a cell and adds the character to it, this ensures players can
         all see and interact with eachother and entities within the same cell.
+        The cell should be fetched first.
 
         :param x: The x coordinate of the cell.
         :param z: The z coordinate of the cell.
         :param character: The character."""
-        for cell in cls._loaded_cells:
-            if cell._x == x and cell._z == z:
-                if character not in cell._characters:
-                    cell._characters.append(character)
-                return cell
-        cell = Cell(x, z)
-        cell._characters.append(character)
-        cls._loaded_cells.append(cell)
-        logging.info(f"loaded cell {x}, {z} due to player [{character._id}] [{character._name}]")
+        cell = cls._loaded_cells.get(x, z)
+        if cell is not None:
+            cell.add_character(character)
+            return cell
+        cell = cls._hibernating_cells.take(x, z)
+        revived = cell is not None
+        if not revived:
+            cell = Cell(x, z, cls._cell_store.load(x, z))
+        cell.add_character(character)
+        cls._loaded_cells.add(cell)
+        cell.wake()
+        logging.info(f"loaded [%s] cell {x}, {z} due to player [{character._id}] [{character._name}]", "hibernating" if revived else "new")
         return cell
 
     @classmethod
     def unload_cell(cls, x: int, z: int, character: 'Character'):
         """Removes a character from a cell and if the cell is now empty, saves
-        and unloads the cell to prevent cells from keeping in memory.
+        and unloads the cell, hibernating it so it can be revived if a
+        character returns shortly after.
 
         :param x: The x coordinate of the cell.
         :param z: The z coordinate of the cell.
         :param character: The character."""
-        loaded_cell = None
-        for cell in cls._loaded_cells:
-            if cell._x == x and cell._z == z:
-                loaded_cell = cell
-                break
+        loaded_cell = cls._loaded_cells.get(x, z)
         if not loaded_cell:
             return
-        loaded_cell._characters.remove(character)
+        loaded_cell.remove_character(character)
         if not loaded_cell._characters:
             cls._loaded_cells.remove(loaded_cell)
+            cls._cell_store.queue(loaded_cell)
+            cls._hibernating_cells.put(loaded_cell)
         logging.info(f"unloaded cell {x}, {z} due to player [{character._id}] [{character._name}]")
 
     @classmethod
-    def get_cell(cls, x: int, z: int) -> Cell:
-        """Gets a cell without loading it in, if it's loaded it will use the
-        loaded cell, useful for generating map data."""
+    def save_cells(cls):
+        """Saves every loaded and hibernating cell and waits for them to be
+        written, used when the server is shutting down."""
         for cell in cls._loaded_cells:
-            if cell._x == x and cell._z == z:
-                return cell
-        return Cell(x, z)
+            cls._cell_store.queue(cell)
+        for cell in cls._hibernating_cells:
+            cls._cell_store.queue(cell)
+        cls._cell_store.flush(wait=True)
+
+    @classmethod
+    def get_biome(cls, x: int, z: int) -> str:
+        """Gets the biome at the given coordinate without constructing a cell,
+        useful for generating map data.
+
+        :param x: The x coordinate of the cell.
+        :param z: The z coordinate of the cell."""
+        cell = cls._loaded_cells.get(x, z)
+        if cell is not None:
+            return cell._biome
+        return terrain.get_biome(x, z)
+
+    @classmethod
+    def is_passable(cls, x: int, z: int) -> bool:
+        """Checks whether characters can move onto the given coordinate.
+
+        :param x: The x coordinate of the cell.
+        :param z: The z coordinate of the cell."""
+        return cls.get_biome(x, z) not in terrain.IMMOVABLE_BIOMES
+
+    @classmethod
+    def get_population(cls, x: int, z: int) -> int:
+        """Gets the number of characters within the cell at the given
+        coordinate, unloaded cells are always empty.
+
+        :param x: The x coordinate of the cell.
+        :param z: The z coordinate of the cell."""
+        cell = cls._loaded_cells.get(x, z)
+        if cell is None:
+            return 0
+        return len(cell._characters)
+
+    @classmethod
+    def owns(cls, x: int, z: int) -> bool:
+        """Checks whether the given coordinate is simulated by this process,
+        always true unless the world is split into shards.
+
+        :param x: The x coordinate of the cell.
+        :param z: The z coordinate of the cell."""
+        return cls._shard is None or cls._shard.owns(x, z)
+
+    @classmethod
+    async def hand_off(cls, character: 'Character'):
+        """Saves and removes a character which has moved onto a coordinate
+        owned by another shard, so that shard can take it over once the save
+        has been written.
+
+        :param character: The character, already removed from its cell."""
+        character.unschedule()
+        cls._characters.remove(character)
+        # A disconnected character can be moved, such as when it dies, its
+        # expiry would otherwise save over its state on the new shard.
+        cls._awaiting_characters.remove(character)
+        timer = cls._awaiting_timers.pop(character._id, None)
+        if timer:
+            timer.cancel()
+        try:
+            await asyncio.wrap_future(character.save_character())
+        except Exception:
+            # The cell store logs the failure, the new shard carries on from
+            # the last save that was written.
+            pass
+        cls._shard.hand_off(character)
+        logging.info(f"handed off player [{character._id}] [{character._name}] at {character._x}, {character._z}")
 
     @classmethod
     async def send_to_all(cls, type: str, message: str, *args, **kwargs):
@@ -86,6 +396,9 @@ class World:
         :param message: The message to send.
         :param *args: The arguments for formatting.
         :param **kwargs: The arguments for formatting."""
+        if cls._shard is not None:
+            cls._shard.broadcast(dict(type=type, data=replace_colors(message.format(*args, **kwargs))))
+            return
         await asyncio.gather(*[character.send_message(type, message, *args, **kwargs) for character in cls._characters])
 
     @classmethod
@@ -93,14 +406,12 @@ class World:
         """Adds a character to the world pool
 
         :param character: The character to add."""
-        existing = False
-        for awaiting_character in cls._awaiting_characters:
-            if awaiting_character[0]._id == character._id:
-                cls._awaiting_characters.remove(awaiting_character)
-                existing = True
-                break
-        if character not in cls._characters:
-            cls._characters.append(character)
+        awaiting = cls._awaiting_characters.get(character._id)
+        existing = awaiting is not None
+        if awaiting:
+            cls._awaiting_characters.remove(awaiting)
+            cls._awaiting_timers.pop(character._id).cancel()
+        cls._characters.add(character)
         logging.info(f"added [%s] player [{character._id}] [{character._name}] to the world", "existing" if existing else "new")
 
     @classmethod
@@ -108,42 +419,71 @@ class World:
         """Removes a character from the world pool.
 
         :param character: The character to remove."""
-        if character in cls._characters:
-            cls._characters.remove(character)
-        cls._awaiting_characters.append((character, datetime.now()))
+        cls._characters.remove(character)
+        timer = cls._awaiting_timers.pop(character._id, None)
+        if timer:
+            timer.cancel()
+        cls._awaiting_characters.add(character)
+        cls._awaiting_timers[character._id] = TIMER_WHEEL.schedule(
+            AWAITING_TICKS, partial(cls.expire_player, character._id))
         logging.info(f"removed player [{character._id}] [{character._name}] from the world")
+
+    @classmethod
+    async def expire_player(cls, id: str):
+        """Saves and unloads a disconnected character which has not
+        reconnected in time.
+
+        :param id: The id of the player."""
+        character = cls._awaiting_characters.get(id)
+        if character is None:
+            return
+        cls._awaiting_characters.remove(character)
+        del cls._awaiting_timers[id]
+        character.unschedule()
+        if character._cell:
+            cls.unload_cell(character._x, character._z, character)
+        character.save_character()
     
+    @classmethod
+    def rename_player(cls, character: 'Character', name: str):
+        """Sets the name of a character, keeping the player indexes up to
+        date.
+
+        :param character: The character to rename.
+        :param name: The new name."""
+        cls._characters.rename(character, name)
+        cls._awaiting_characters.rename(character, name)
+        character._name = name
+
     @classmethod
     def get_player_by_id(cls, id: int, awaiting=False) -> 'Character':
         """Gets a player by their id.
 
         :param id: The id of the player.
         :param awaiting: Whether to include awaiting characters."""
-        if awaiting:
-            for character in cls._awaiting_characters:
-                if character[0]._id == id:
-                    return character[0]
-        for character in cls._characters:
-            if character._id == id:
-                return character
-        return None
+        if awaiting and id in cls._awaiting_timers:
+            return cls._awaiting_characters.get(id)
+        return cls._characters.get(id)
     
     @classmethod
     def get_player(cls, name: str, awaiting=False) -> 'Character':
-        """Gets a player by their name.
+        """Gets a player by their name, ignoring case.
 
         :param name: The name of the player.
         :param awaiting: Whether to include awaiting characters."""
         if awaiting:
-            for character in cls._awaiting_characters:
-                if character[0]._name == name:
-                    return character
-        for character in cls._characters:
-            if character._name == name:
+            character = cls._awaiting_characters.get_by_name(name)
+            if character is not None:
                 return character
-        return None
+        return cls._characters.get_by_name(name)
 
 
-World._characters = []
-World._awaiting_characters = []
-World._loaded_cells = []
+World._characters = PlayerRegistry()
+World._awaiting_characters = PlayerRegistry()
+World._awaiting_timers = {}
+World._loaded_cells = CellRegistry()
+World._hibernating_cells = HibernatingCellCache(
+    HIBERNATE_CELL_BUDGET, HIBERNATE_SECONDS)
+World._cell_store = CellStore()
+World._shard = None
+TIMER_WHEEL.observer = TICK_METRICS.record_timer
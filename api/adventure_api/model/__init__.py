@@ -1,3 +1,4 @@
-from .user import get_auth_user, get_users, check_password, register_user, get_user_by_id, get_guest_user
+from .cell import get_cell_coordinates, get_cell_data, save_cells
+from .user import get_auth_user, get_users, check_password, register_user, get_user_by_id, get_guest_user, get_user_location, save_user_character
 
-__all__ = ['get_auth_user', 'get_users', 'check_password', 'register_user', 'get_user_by_id', 'get_guest_user']
\ No newline at end of file
+__all__ = ['get_auth_user', 'get_users', 'check_password', 'register_user', 'get_user_by_id', 'get_guest_user', 'get_user_location', 'save_user_character', 'get_cell_coordinates', 'get_cell_data', 'save_cells']
\ No newline at end of file
@@ -0,0 +1,86 @@
+import psycopg2
+from typing import Iterable, List, Optional, Tuple
+
+from config import get_conn, get_thread_conn, reset_thread_conn
+
+
+def get_cell_coordinates() -> List[Tuple[int, int]]:
+    driver, conn = get_conn()
+    if driver == 'sqlite':
+        try:
+            cur = conn.cursor()
+            try:
+                cur.execute('SELECT x, z FROM cells')
+                return [(row[0], row[1]) for row in cur.fetchall()]
+            finally:
+                cur.close()
+        finally:
+            conn.close()
+    elif driver == 'postgres':
+        with conn.cursor() as curs:
+            curs.execute('SELECT x, z FROM cells')
+            return [(row[0], row[1]) for row in curs.fetchall()]
+
+
+def get_cell_data(x: int, z: int) -> Optional[str]:
+    """Gets the saved data of a cell. This is called from the cell store's
+    writer thread, so it uses a connection owned by that thread rather than
+    the shared one.
+
+    :param x: The x coordinate of the cell.
+    :param z: The z coordinate of the cell."""
+    driver, conn = get_thread_conn()
+    if driver == 'sqlite':
+        try:
+            cur = conn.cursor()
+            try:
+                cur.execute('SELECT data FROM cells WHERE x = ? AND z = ?', [x, z])
+                row = cur.fetchone()
+                return row[0] if row else None
+            finally:
+                cur.close()
+        finally:
+            conn.close()
+    elif driver == 'postgres':
+        with conn.cursor() as curs:
+            curs.execute('SELECT data FROM cells WHERE x = %s AND z = %s', [x, z])
+            row = curs.fetchone()
+            return row[0] if row else None
+
+
+def save_cells(cells: Iterable[Tuple[int, int, str]]):
+    """Saves the data of many cells in a single transaction. This is called
+    from the cell store's writer thread, so it uses a connection owned by that
+    thread rather than the shared one.
+
+    :param cells: The x, z and data of each cell."""
+    cells = list(cells)
+    if not cells:
+        return
+    driver, conn = get_thread_conn()
+    if driver == 'sqlite':
+        try:
+            conn.executemany(
+                '''INSERT INTO cells (x, z, data) VALUES (?, ?, ?)
+                ON CONFLICT (x, z) DO UPDATE SET data = excluded.data, last_saved = CURRENT_TIMESTAMP''',
+                cells)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+    elif driver == 'postgres':
+        try:
+            with conn.cursor() as cur:
+                cur.executemany(
+                    '''INSERT INTO cells (x, z, data) VALUES (%s, %s, %s)
+                    ON CONFLICT (x, z) DO UPDATE SET data = excluded.data, last_saved = CURRENT_TIMESTAMP''',
+                    cells)
+            conn.commit()
+        except Exception:
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                reset_thread_conn()
+            raise
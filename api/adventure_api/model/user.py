@@ -1,7 +1,9 @@
+import psycopg2
 from bcrypt import checkpw, hashpw, gensalt
+from typing import Optional, Tuple
 from uuid import uuid4
 
-from config import get_conn
+from config import get_conn, get_thread_conn, reset_thread_conn
 
 
 def get_user_by_id(user_id):
@@ -50,6 +52,26 @@ def get_user_by_id(user_id):
             )
 
 
+def get_user_location(user_id) -> Optional[Tuple[int, int]]:
+    driver, conn = get_conn()
+    if driver == 'sqlite':
+        try:
+            cur = conn.cursor()
+            try:
+                cur.execute('SELECT x, z FROM users WHERE id = ?', [user_id])
+                row = cur.fetchone()
+                return (row[0], row[1]) if row else None
+            finally:
+                cur.close()
+        finally:
+            conn.close()
+    elif driver == 'postgres':
+        with conn.cursor() as curs:
+            curs.execute('SELECT x, z FROM users WHERE id = %s', [user_id])
+            row = curs.fetchone()
+            return (row[0], row[1]) if row else None
+
+
 def get_auth_user(email):
     driver, conn = get_conn()
     if driver == 'sqlite':
@@ -200,3 +222,34 @@ def get_guest_user(guest_id: str = None, guest_key: str = None):
         'is_admin': False,
         'is_guest': True
     }
+
+
+def save_user_character(user_id, name: str, x: int, z: int, state: str, additional_data: str):
+    """Saves the character of a user. This is called from the cell store's
+    writer thread, so it uses a connection owned by that thread rather than
+    the shared one."""
+    driver, conn = get_thread_conn()
+    if driver == 'sqlite':
+        try:
+            conn.execute(
+                'UPDATE USERS SET name = ?, x = ?, z = ?, state = ?, additional_data = ? WHERE id = ?', [
+                    name, x, z, state, additional_data, user_id])
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+    elif driver == 'postgres':
+        try:
+            with conn.cursor() as cur:
+                cur.execute(
+                    'UPDATE users SET name = %s, x = %s, z = %s, state = %s, additional_data = %s WHERE id = %s', [
+                        name, x, z, state, additional_data, user_id])
+            conn.commit()
+        except Exception:
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                reset_thread_conn()
+            raise
@@ -157,6 +157,35 @@ def create_bug_report_table():
         conn.commit()
 
 
+def create_cell_table():
+    """Creates the cells table if it doesn't exist"""
+    driver, conn = get_conn()
+    if driver == 'sqlite':
+        try:
+            conn.execute(
+                '''CREATE TABLE IF NOT EXISTS cells (
+                x INT NOT NULL,
+                z INT NOT NULL,
+                data TEXT DEFAULT '{}',
+                last_saved TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (x, z)
+                )'''
+                )
+            conn.commit()
+        finally:
+            conn.close()
+    elif driver == 'postgres':
+        with conn.cursor() as cur:
+            cur.execute('''CREATE TABLE IF NOT EXISTS cells (
+                x INT NOT NULL,
+                z INT NOT NULL,
+                data TEXT DEFAULT '{}',
+                last_saved TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (x, z)
+                )''')
+        conn.commit()
+
+
 def migrate():
     """Migrate the database"""
     driver, conn = get_conn()
@@ -208,5 +237,6 @@ def setup_database():
     create_chatlog_table()
     create_audit_table()
     create_bug_report_table()
+    create_cell_table()
 
     migrate()
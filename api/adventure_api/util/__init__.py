@@ -46,4 +46,6 @@ def find_closest_match(input_word: str, choices: List[str]) -> str:
     return (best_match, best_distance)
     
 
+from .fuzzy import BKTree
+from .trie import PrefixTrie
 from .xp import EXP_TABLE
@@ -0,0 +1,115 @@
+import textdistance
+from typing import Iterable, List, Optional, Tuple
+
+from . import min_distance_threshold
+
+# The unrestricted Damerau-Levenshtein distance is a metric, which the tree
+# relies on to skip branches, the restricted form is not. The unrestricted
+# distance is never more than the restricted one, so matches are checked with
+# the restricted distance find_closest_match uses.
+_distance = textdistance.DamerauLevenshtein(restricted=False).distance
+_restricted_distance = textdistance.damerau_levenshtein.distance
+
+
+def _search_radius(length: int) -> int:
+    """The furthest distance a match can be from a word of the given length.
+    A match can be longer than the word and so be allowed a larger distance
+    by min_distance_threshold, the radius covers those matches too.
+
+    :param length: The length of the word."""
+    return max(
+        distance for distance in range(min_distance_threshold(999) + 1)
+        if distance <= min_distance_threshold(length + distance))
+
+
+class BKTree:
+    """A BK-tree of words for finding the closest match to a misspelt word.
+
+    Each child of a node is keyed by its distance from the node, so a search
+    within a given distance only follows the children whose key is within that
+    distance of the search word's own distance from the node, most of the tree
+    is never compared against."""
+    _root: Optional[list]
+    _size: int
+
+    def __init__(self, words: Iterable[str] = ()):
+        """Constructs the BKTree.
+
+        :param words: The words to add to the tree."""
+        self._root = None
+        self._size = 0
+        for word in words:
+            self.add(word)
+
+    def add(self, word: str):
+        """Adds a word to the tree, words which are already in the tree are
+        ignored.
+
+        :param word: The word to add."""
+        # A node is [word, the order it was added, children by distance].
+        node = [word, self._size, {}]
+        if self._root is None:
+            self._root = node
+            self._size += 1
+            return
+        current = self._root
+        while True:
+            distance = _distance(word, current[0])
+            if distance == 0:
+                return
+            child = current[2].get(distance)
+            if child is None:
+                current[2][distance] = node
+                self._size += 1
+                return
+            current = child
+
+    def search(self, word: str, max_distance: int) -> List[Tuple[int, int, str]]:
+        """Finds every word within a distance of the given word.
+
+        :param word: The word to search for.
+        :param max_distance: The furthest distance to include.
+
+        :return: The distance, the order it was added and the word for each
+                 match."""
+        if self._root is None:
+            return []
+        matches = []
+        nodes = [self._root]
+        while nodes:
+            node = nodes.pop()
+            # The distance is at least the difference in length and at most
+            # the longer length. A word too different in length can't match,
+            # so its children are followed by those bounds rather than paying
+            # for the distance.
+            lower = abs(len(word) - len(node[0]))
+            if lower > max_distance:
+                upper = max(len(word), len(node[0]))
+            else:
+                lower = upper = _distance(word, node[0])
+                if lower <= max_distance:
+                    matches.append((lower, node[1], node[0]))
+            for child_distance, child in node[2].items():
+                if lower - max_distance <= child_distance <= upper + max_distance:
+                    nodes.append(child)
+        return matches
+
+    def closest(self, word: str) -> Tuple[Optional[str], int]:
+        """Finds the closest word within the distance allowed for its length,
+        the same as find_closest_match. Ties go to the word added first.
+
+        :param word: The word to match.
+
+        :return: The closest matching word and the distance as a tuple."""
+        matches = []
+        for _, order, match in self.search(word, _search_radius(len(word))):
+            distance = _restricted_distance(word, match)
+            if distance <= min_distance_threshold(len(match)):
+                matches.append((distance, order, match))
+        if not matches:
+            return (None, 999)
+        distance, _, match = min(matches)
+        return (match, distance)
+
+    def __len__(self) -> int:
+        return self._size
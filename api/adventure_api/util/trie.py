@@ -0,0 +1,64 @@
+from typing import Dict, Iterable, Optional
+
+
+class _Node:
+    __slots__ = ('children', 'first', 'order')
+
+    def __init__(self):
+        self.children: Dict[str, '_Node'] = {}
+        self.first: Optional[str] = None
+        self.order: Optional[int] = None
+
+
+class PrefixTrie:
+    """A trie of words for completing a prefix. Every node remembers the first
+    word added beneath it, so finding the first completion only walks the
+    prefix rather than checking every word."""
+    _root: _Node
+    _size: int
+
+    def __init__(self, words: Iterable[str] = ()):
+        """Constructs the PrefixTrie.
+
+        :param words: The words to add to the trie, in order."""
+        self._root = _Node()
+        self._size = 0
+        for word in words:
+            self.add(word)
+
+    def add(self, word: str):
+        """Adds a word to the trie, words which are already in the trie keep
+        their original order.
+
+        :param word: The word to add."""
+        node = self._root
+        if node.first is None:
+            node.first = word
+        for char in word:
+            child = node.children.get(char)
+            if child is None:
+                child = node.children[char] = _Node()
+            if child.first is None:
+                child.first = word
+            node = child
+        if node.order is None:
+            node.order = self._size
+            self._size += 1
+
+    def _find(self, prefix: str) -> Optional[_Node]:
+        node = self._root
+        for char in prefix:
+            node = node.children.get(char)
+            if node is None:
+                return None
+        return node
+
+    def first(self, prefix: str) -> Optional[str]:
+        """Returns the first added word which starts with the prefix.
+
+        :param prefix: The prefix to complete."""
+        node = self._find(prefix)
+        return node.first if node is not None else None
+
+    def __len__(self) -> int:
+        return self._size
@@ -0,0 +1,13 @@
+import os
+import sys
+import tempfile
+
+API_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The game loads its data relative to the api folder when it is imported.
+os.chdir(API_PATH)
+sys.path.insert(0, os.path.join(API_PATH, 'adventure_api'))
+os.environ['DB_DRIVER'] = 'sqlite'
+os.environ['DB_FILE'] = os.path.join(tempfile.mkdtemp(), 'test.db')
+os.environ.setdefault('CLIENT_ID', 'test')
+os.environ.setdefault('CLIENT_SECRET', 'test')
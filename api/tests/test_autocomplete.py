@@ -0,0 +1,88 @@
+import asyncio
+from collections import OrderedDict
+from typing import List
+from game import World
+from game.commands.base import CommandHandler
+from test_scavenge import create_character
+
+ARGUMENTS = [
+    '', 'i', 'in', 'input', 's', 'n', 'north', 'east', 'r', 'rabbit',
+    'rock', 'sentence', '"dead', 'dead rabbit', 'help', 'st']
+SECOND_ARGUMENTS = [None, '', 's', 'smooth', 'true', '1']
+
+
+def scan_suggestion(h: CommandHandler, cmd: List[str], alternative=False) -> str:
+    """The autocomplete before the tries, which scanned every command and
+    suggestion for the first one starting with the input."""
+    if not cmd or not cmd[0]:
+        return ''
+    commands = [
+        (k, v.__command__)
+        for handler in h._handlers
+        for k, v in handler.__class__.__dict__.items()
+        if getattr(v, '__command__', None) is not None]
+    valid = [(k, v) for k, v in commands if k.startswith(cmd[0])]
+    if not valid:
+        return ''
+    name, fn = valid[0]
+    if cmd[0] != name:
+        return name if len(cmd) == 1 else ''
+    if len(cmd) == 1:
+        return ''
+    params = fn.get('params', None)
+    if not params or len(cmd) - 1 > len(params):
+        return ''
+    raw = []
+    for handler in h._handlers:
+        for v in handler.__class__.__dict__.values():
+            if getattr(v, '__autocomplete__', None) in params[len(cmd) - 2]:
+                raw.extend(v(handler, *(h._build_initial_argument_list(v) + [cmd])))
+    suggestions = raw
+    if alternative:
+        suggestions = [
+            s[1: -1] if len(s) > 2 and s[0] == '"' and s[-1] == '"' else s
+            for s in raw]
+    raw = list(OrderedDict.fromkeys(raw))
+    suggestions = list(OrderedDict.fromkeys(suggestions))
+    if cmd[-1] not in suggestions:
+        return ' '.join(cmd[:-1]) + ' ' + next(
+            (s for s in raw if s.startswith(cmd[-1])), '')
+    if not alternative:
+        return ''
+    idx = suggestions.index(cmd[-1]) + 1
+    if idx == len(suggestions):
+        idx = 0
+    return ' '.join(cmd[:-1]) + ' ' + raw[idx]
+
+
+def compare(h: CommandHandler) -> int:
+    names = [c['func'].__name__ for c in h.get_command_list()]
+    inputs = [[''], ['h'], ['he'], ['help'], ['s'], ['st'], ['x']]
+    for name in names + ['set', 'go', 'look', 'attack', 'drop', 'pickup']:
+        for argument in ARGUMENTS:
+            for second in SECOND_ARGUMENTS:
+                inputs.append([name, argument] + ([second] if second is not None else []))
+    for cmd in inputs:
+        for alternative in (False, True):
+            assert h.get_suggestion(list(cmd), alternative) == \
+                scan_suggestion(h, list(cmd), alternative), (cmd, alternative)
+    cmd = ['help', '']
+    for _ in range(30):
+        suggestion = h.get_suggestion(list(cmd), True)
+        assert suggestion == scan_suggestion(h, list(cmd), True)
+        cmd = suggestion.split(' ') if suggestion else cmd
+    return len(inputs)
+
+
+def test_completion_matches_list_scan():
+    async def run():
+        c = create_character('completer')
+        World.add_player(c)
+        await c.handle_login()
+        checked = compare(c.command_handler)
+        await c.command_handler.handle_input(['begin', 'Completer'])
+        c._cell.spawn('rabbit')
+        checked += compare(c.command_handler)
+        return checked
+
+    assert asyncio.run(run()) > 1000
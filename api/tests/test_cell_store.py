@@ -0,0 +1,30 @@
+import asyncio
+from game import cell_store
+from game.cell import Cell
+from game.cell_store import CellStore
+from model import get_user_location
+from test_scavenge import create_character
+
+
+def test_fetched_cells_load_without_the_database(monkeypatch):
+    store = CellStore()
+    cell = Cell(40, -40)
+    cell.spawn('rabbit')
+    store.queue(cell)
+    store.flush(wait=True)
+
+    store = CellStore()
+    store.load_index()
+    asyncio.run(store.fetch(40, -40))
+
+    def read(x, z):
+        raise AssertionError('the cell was read on the game loop')
+    monkeypatch.setattr(cell_store, 'get_cell_data', read)
+    assert store.load(40, -40) == cell.to_json()
+
+
+def test_character_saves_are_written_in_the_background():
+    c = create_character('saver')
+    c._x, c._z = 3, -7
+    c.save_character().result()
+    assert get_user_location('saver') == (3, -7)
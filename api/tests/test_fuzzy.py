@@ -0,0 +1,54 @@
+import random
+import string
+from game.commands import STATE_HANDLERS
+from game.commands.base import CommandTable
+from util import BKTree, find_closest_match
+
+
+def misspell(rng: random.Random, word: str) -> str:
+    chars = list(word)
+    for _ in range(rng.randint(0, 3)):
+        i = rng.randrange(len(chars) + 1)
+        edit = rng.randrange(4)
+        if edit == 0 or not chars:
+            chars.insert(i, rng.choice(string.ascii_lowercase))
+        elif edit == 1:
+            del chars[min(i, len(chars) - 1)]
+        elif edit == 2:
+            chars[min(i, len(chars) - 1)] = rng.choice(string.ascii_lowercase)
+        elif len(chars) > 1:
+            j = min(i, len(chars) - 2)
+            chars[j], chars[j + 1] = chars[j + 1], chars[j]
+    return ''.join(chars)
+
+
+def sample_inputs(words, count: int):
+    rng = random.Random(0)
+    inputs = [misspell(rng, rng.choice(words)) for _ in range(count)]
+    inputs += [
+        ''.join(rng.choices(string.ascii_lowercase, k=rng.randint(1, 9)))
+        for _ in range(count // 2)]
+    return inputs
+
+
+def test_closest_matches_linear_scan():
+    words = [
+        'go', 'say', 'look', 'help', 'stats', 'attack', 'survey',
+        'scavenge', 'inventory', 'pickup', 'sea', 'rabbit', 'rabbits',
+        'wolf', 'wolves', 'bear', 'sagewort', 'eat', 'ate', 'tea']
+    tree = BKTree(words)
+    for word in sample_inputs(words, 300):
+        assert tree.closest(word) == find_closest_match(word, words), word
+
+
+def test_did_you_mean_matches_linear_scan():
+    for handlers in STATE_HANDLERS.values():
+        table = CommandTable.for_handlers(handlers)
+        commands = list(table.commands)
+        for word in sample_inputs(commands, 200):
+            suggestion, _ = table.fuzzy.closest(word)
+            expected, _ = find_closest_match(word, commands)
+            # Only the move alias is suggested on top of the commands.
+            if suggestion == 'move' and expected is None:
+                continue
+            assert suggestion == expected, word
@@ -0,0 +1,33 @@
+import asyncio
+from game.cell import Cell
+from game.enemy import ENEMY_DATA
+from game.interest import INTEREST_GRID
+
+
+class Listener:
+    def __init__(self):
+        self.messages = []
+
+    async def send_message(self, type, message, *args, **kwargs):
+        self.messages.append(message.format(*args, **kwargs))
+
+
+def test_wolf_howl_reaches_neighbouring_cells():
+    cells = [Cell(1000, 1000), Cell(1003, 998), Cell(1004, 1000)]
+    listeners = []
+    for cell in cells:
+        listener = Listener()
+        cell._characters.append(listener)
+        listeners.append(listener)
+        INTEREST_GRID.add(cell)
+    try:
+        wolf = cells[0].spawn('wolf')
+        asyncio.run(ENEMY_DATA['wolf']['on_entry'](wolf, cells[0]))
+    finally:
+        for cell in cells:
+            INTEREST_GRID.remove(cell)
+    howl = 'You hear the howl of a @red@wolf@res@ nearby.'
+    assert listeners[0].messages[0] == howl
+    assert len(listeners[0].messages) == 2
+    assert listeners[1].messages == [howl]
+    assert listeners[2].messages == []
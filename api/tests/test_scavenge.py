@@ -0,0 +1,59 @@
+import asyncio
+import setup
+from config import get_conn
+from game import Character, World
+from game.cell import load_biomes
+from game.data import load_data
+
+setup.create_user_table()
+setup.create_cell_table()
+load_data()
+load_biomes()
+
+
+class FakeState:
+    value = 1
+
+
+class FakeSocket:
+    client_state = FakeState()
+
+    def __init__(self):
+        self.messages = []
+
+    async def send_json(self, data):
+        self.messages.append(data)
+
+    async def close(self):
+        pass
+
+
+def create_character(id: str) -> Character:
+    _, conn = get_conn()
+    conn.execute(
+        "INSERT INTO users (id, email, password) VALUES (?, ?, 'x')",
+        (id, f'{id}@test'))
+    conn.commit()
+    conn.close()
+    return Character(id, FakeSocket(), 'session')
+
+
+def test_stop_scavenging():
+    async def run():
+        c = create_character('scavenger')
+        c.start_writer()
+        World.add_player(c)
+        await c.handle_login()
+        await c.command_handler.handle_input(['begin', 'Scavenger'])
+        assert c._cell.can_scavenge
+        await c.command_handler.handle_input(['scavenge'])
+        assert c._action == 'scavenge'
+        await c.command_handler.handle_input(['stop'])
+        assert c._action is None
+        while not c._outbox.empty():
+            await asyncio.sleep(0)
+        c.stop_writer()
+        return c._ws.messages
+
+    messages = asyncio.run(run())
+    assert any('You stop scavenging.' in m.get('data', '') for m in messages)
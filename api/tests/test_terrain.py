@@ -0,0 +1,78 @@
+import pytest
+from game import terrain
+from game.terrain import (
+    BIOMES, CHUNK_SIZE, TERRAIN_FILE_HEADER, TERRAIN_FILE_MAGIC,
+    TERRAIN_FILE_VERSION, TerrainFile, bake_terrain, generate_biome,
+    generate_biome_grid)
+
+# Regions around the origin, in negative coordinates and far out, where the
+# float32 noise is most likely to drift from snoise2.
+REGIONS = [
+    (-256, -256, 512, 256),
+    (-5000, 3000, 96, 96),
+    (123456, -98765, 96, 96),
+    (-1000000, -1000000, 64, 64),
+]
+
+
+@pytest.mark.parametrize('x, z, width, depth', REGIONS)
+def test_grid_matches_per_tile_noise(x, z, width, depth):
+    grid = generate_biome_grid(x, z, width, depth)
+    assert grid.shape == (depth, width)
+    mismatches = [
+        (x + dx, z + dz)
+        for dz in range(depth) for dx in range(width)
+        if BIOMES[grid[dz, dx]] != generate_biome(x + dx, z + dz)]
+    assert mismatches == []
+
+
+def test_chunks_match_per_tile_noise():
+    for x, z in [(0, 0), (-1, -1), (CHUNK_SIZE - 1, CHUNK_SIZE), (-CHUNK_SIZE, 7), (54321, -12345)]:
+        assert terrain.get_biome(x, z) == generate_biome(x, z)
+
+
+def test_header_layout():
+    assert TERRAIN_FILE_HEADER.size == 26
+    header = TERRAIN_FILE_HEADER.pack(
+        TERRAIN_FILE_MAGIC, TERRAIN_FILE_VERSION, -3, 5, 7, 9,
+        terrain.HEIGHT_SCALE, terrain.TREE_SCALE)
+    assert header[:4] == b'NYMT'
+    assert TERRAIN_FILE_HEADER.unpack(header)[2:6] == (-3, 5, 7, 9)
+
+
+def test_baked_file_matches_per_tile_noise(tmp_path, monkeypatch):
+    monkeypatch.setattr(terrain, '_terrain_file', None)
+    path = str(tmp_path / 'terrain.bin')
+    bake_terrain(path, -40, -30, 80, 70)
+    terrain.load_terrain_file(path)
+    terrain_file = terrain._terrain_file
+    assert terrain_file.bounds == (-40, -30, 80, 70)
+    try:
+        for z in range(-30, 40):
+            for x in range(-40, 40):
+                assert terrain.get_biome(x, z) == generate_biome(x, z)
+        assert not terrain_file.contains(40, 0)
+    finally:
+        terrain_file.close()
+
+
+def test_rejects_unsupported_files(tmp_path):
+    path = tmp_path / 'terrain.bin'
+    header = TERRAIN_FILE_HEADER.pack(
+        b'NOPE', TERRAIN_FILE_VERSION, 0, 0, 1, 1,
+        terrain.HEIGHT_SCALE, terrain.TREE_SCALE)
+    path.write_bytes(header + b'\x00')
+    with pytest.raises(ValueError):
+        TerrainFile(str(path))
+    header = TERRAIN_FILE_HEADER.pack(
+        TERRAIN_FILE_MAGIC, TERRAIN_FILE_VERSION, 0, 0, 1, 1,
+        terrain.HEIGHT_SCALE + 1, terrain.TREE_SCALE)
+    path.write_bytes(header + b'\x00')
+    with pytest.raises(ValueError):
+        TerrainFile(str(path))
+    header = TERRAIN_FILE_HEADER.pack(
+        TERRAIN_FILE_MAGIC, TERRAIN_FILE_VERSION, 0, 0, 2, 2,
+        terrain.HEIGHT_SCALE, terrain.TREE_SCALE)
+    path.write_bytes(header + b'\x00')
+    with pytest.raises(ValueError):
+        TerrainFile(str(path))
@@ -0,0 +1,68 @@
+import asyncio
+from game.timer_wheel import TimerWheel, WHEEL_BITS, WHEEL_LEVELS
+
+
+def schedule(wheel: TimerWheel, delay: int, fired: list):
+    async def callback():
+        fired.append(wheel.tick)
+    return wheel.schedule(delay, callback)
+
+
+def turn(wheel: TimerWheel, ticks: int):
+    async def run():
+        for _ in range(ticks):
+            await wheel.turn()
+    asyncio.run(run())
+
+
+def test_timers_fire_on_their_tick():
+    wheel = TimerWheel()
+    fired = []
+    delays = [1, 63, 64, 65, 100, 4095, 4096, 5000]
+    for delay in delays:
+        schedule(wheel, delay, fired)
+    turn(wheel, 5000)
+    assert fired == delays
+
+
+def test_timers_fire_when_scheduled_mid_wheel():
+    wheel = TimerWheel()
+    turn(wheel, 127)
+    fired = []
+    schedule(wheel, 64, fired)
+    schedule(wheel, 4000, fired)
+    turn(wheel, 4000)
+    assert fired == [127 + 64, 127 + 4000]
+
+
+def test_cancel_after_cascade():
+    wheel = TimerWheel()
+    fired = []
+    timer = schedule(wheel, 100, fired)
+    # The timer is on the second level until the wheel reaches its slot.
+    turn(wheel, 64)
+    assert timer in wheel._levels[0][100 & ((1 << WHEEL_BITS) - 1)]
+    timer.cancel()
+    turn(wheel, 100)
+    assert fired == []
+    assert len(wheel) == 0
+
+
+def test_overflow_timers_reenter_the_wheel():
+    wheel = TimerWheel()
+    fired = []
+    span = 1 << (WHEEL_BITS * WHEEL_LEVELS)
+    delay = span + 70
+    timer = schedule(wheel, delay, fired)
+    assert timer in wheel._overflow
+    turn(wheel, span)
+    assert timer not in wheel._overflow
+    assert fired == []
+    turn(wheel, 70)
+    assert fired == [delay]
+
+
+def test_world_tick_counts_from_the_epoch():
+    wheel = TimerWheel()
+    turn(wheel, 3)
+    assert wheel.world_tick == wheel._epoch + 3
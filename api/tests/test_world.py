@@ -0,0 +1,42 @@
+import asyncio
+from game import World
+from game.character import disconnect_character
+from test_scavenge import create_character
+
+
+class FakeShard:
+    """A shard which owns only the spawn, so moving away hands off."""
+
+    def __init__(self):
+        self.handed_off = []
+
+    def owns(self, x: int, z: int) -> bool:
+        return (x, z) == (0, 0)
+
+    def hand_off(self, character):
+        self.handed_off.append(character)
+
+
+def test_hand_off_disconnected_character():
+    async def run():
+        c = create_character('wanderer')
+        c.start_writer()
+        World.add_player(c)
+        await c.handle_login()
+        await c.command_handler.handle_input(['begin', 'Wanderer'])
+        disconnect_character(c, c._ws)
+        assert World.get_player_by_id('wanderer', True) is c
+        timer = World._awaiting_timers['wanderer']
+        shard = FakeShard()
+        World._shard = shard
+        try:
+            await c.move(1, 0)
+        finally:
+            World._shard = None
+        return c, shard, timer
+
+    c, shard, timer = asyncio.run(run())
+    assert shard.handed_off == [c]
+    assert World.get_player_by_id('wanderer', True) is None
+    assert 'wanderer' not in World._awaiting_timers
+    assert timer.cancelled